@@ -0,0 +1,135 @@
+"""站点服务范围栅格
+
+加载数据时把站点覆盖范围（外扩 margin_m）划分为边长 cell_m 的网格，为每个网格预先
+记录按格心距离排序的前 width 个候选站点。只要第 width 名与第 k 名的格心距离差超过
+网格对角线，格内任意一点的真实前 k 近站点必然都在候选中，/nearest 只需查表并对这
+几个候选计算精确距离；不满足该条件的网格（站点极密集处）及范围外的点回退到网格索引。
+
+每个网格距格心最近的站点即为该网格的归属站点，据此导出各站点服务范围的 GeoJSON。
+"""
+from math import cos, radians, sqrt
+
+import numpy as np
+
+from .spatial import EARTH_RADIUS_M
+
+_METERS_PER_DEG_LAT = EARTH_RADIUS_M * radians(1.0)
+
+
+class CoverageGrid:
+    def __init__(
+        self,
+        lng: np.ndarray,
+        lat: np.ndarray,
+        k: int = 5,
+        cell_m: float = 20.0,
+        margin_m: float = 300.0,
+        max_cells: int = 250_000,
+        max_work: int = 200_000_000,
+    ):
+        n = len(lng)
+        self.k = min(k, n)
+        self.width = min(n, k + 11)
+        ref_lat = float(np.mean(lat))
+        m_per_deg_lng = _METERS_PER_DEG_LAT * cos(radians(ref_lat))
+
+        lng_min = float(lng.min()) - margin_m / m_per_deg_lng
+        lat_min = float(lat.min()) - margin_m / _METERS_PER_DEG_LAT
+        width_m = (float(lng.max()) - float(lng.min())) * m_per_deg_lng + 2 * margin_m
+        height_m = (float(lat.max()) - float(lat.min())) * _METERS_PER_DEG_LAT + 2 * margin_m
+
+        # 网格数量（以及 网格数×站点数 的计算量）超出上限时放大网格边长
+        cell_limit = max(1, min(max_cells, max_work // max(n, 1)))
+        cell_m = max(cell_m, sqrt(width_m * height_m / cell_limit))
+        self.cell_m = cell_m
+        self.nx = max(1, int(np.ceil(width_m / cell_m)))
+        self.ny = max(1, int(np.ceil(height_m / cell_m)))
+        self.origin = (lng_min, lat_min)
+        self.dlng = cell_m / m_per_deg_lng
+        self.dlat = cell_m / _METERS_PER_DEG_LAT
+
+        self.candidates = np.empty((self.ny * self.nx, self.width), dtype=np.int32)
+        self.exact = np.empty(self.ny * self.nx, dtype=bool)
+        slack = cell_m * sqrt(2)  # 格内任一点到格心距离的两倍上限
+        lng_r, lat_r = np.radians(lng), np.radians(lat)
+        cos_lat = np.cos(lat_r)
+        col_lng = np.radians(lng_min + (np.arange(self.nx) + 0.5) * self.dlng)
+        rows_per_chunk = max(1, 4_000_000 // max(self.nx * n, 1))
+        for row0 in range(0, self.ny, rows_per_chunk):
+            rows = np.arange(row0, min(row0 + rows_per_chunk, self.ny))
+            c_lat = np.radians(lat_min + (rows + 0.5) * self.dlat)
+            c_lng = np.tile(col_lng, len(rows))[:, None]
+            c_lat = np.repeat(c_lat, self.nx)[:, None]
+            a = np.sin((lat_r - c_lat) / 2) ** 2 + np.cos(c_lat) * cos_lat * np.sin((lng_r - c_lng) / 2) ** 2
+            dist = 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+            if self.width < n:
+                top = np.argpartition(dist, self.width - 1, axis=1)[:, : self.width]
+            else:
+                top = np.broadcast_to(np.arange(n), dist.shape).copy()
+            top_dist = np.take_along_axis(dist, top, axis=1)
+            order = np.argsort(top_dist, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_dist = np.take_along_axis(top_dist, order, axis=1)
+
+            sl = slice(row0 * self.nx, (row0 + len(rows)) * self.nx)
+            self.candidates[sl] = top
+            if self.width < n:
+                # 未入选站点的格心距离 ≥ 第 width 名，若仍大于第 k 名 + slack，则不可能进入格内任一点的前 k 名
+                self.exact[sl] = top_dist[:, self.width - 1] > top_dist[:, self.k - 1] + slack
+            else:
+                self.exact[sl] = True
+
+        # 每个网格的归属站点（距格心最近）
+        self.owner = self.candidates[:, 0].copy()
+
+    def cell_of(self, lng: float, lat: float) -> int | None:
+        ix = int((lng - self.origin[0]) // self.dlng)
+        iy = int((lat - self.origin[1]) // self.dlat)
+        if not (0 <= ix < self.nx and 0 <= iy < self.ny):
+            return None
+        return iy * self.nx + ix
+
+    def candidates_at(self, lng: float, lat: float) -> np.ndarray | None:
+        """返回包含该点真实前 k 近站点的候选下标；点在范围外或该网格无法保证时返回 None"""
+        cell = self.cell_of(lng, lat)
+        if cell is None or not self.exact[cell]:
+            return None
+        return self.candidates[cell]
+
+    def geojson(self, ids: list[str], names: list[str]) -> dict:
+        """按归属站点合并网格，导出各站点服务范围（MultiPolygon）及面积"""
+        cell_area = self.cell_m * self.cell_m
+        polygons: list[list] = [[] for _ in ids]
+        cell_counts = np.bincount(self.owner, minlength=len(ids))
+        owner = self.owner.reshape(self.ny, self.nx)
+        lng0, lat0 = self.origin
+        for iy in range(self.ny):
+            row = owner[iy]
+            # 同一行中连续归属同一站点的网格合并为一个矩形
+            breaks = np.flatnonzero(np.diff(row)) + 1
+            starts = np.concatenate(([0], breaks))
+            ends = np.concatenate((breaks, [self.nx]))
+            y0 = round(lat0 + iy * self.dlat, 7)
+            y1 = round(lat0 + (iy + 1) * self.dlat, 7)
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                x0 = round(lng0 + start * self.dlng, 7)
+                x1 = round(lng0 + end * self.dlng, 7)
+                polygons[row[start]].append([[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]])
+
+        features = []
+        for i, (dustbin_id, name) in enumerate(zip(ids, names)):
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "MultiPolygon", "coordinates": polygons[i]},
+                "properties": {
+                    "id": dustbin_id,
+                    "name": name,
+                    "cells": int(cell_counts[i]),
+                    "area_m2": round(float(cell_counts[i]) * cell_area, 1),
+                },
+            })
+        return {
+            "type": "FeatureCollection",
+            "features": features,
+            "properties": {"cell_m": round(self.cell_m, 2), "nx": self.nx, "ny": self.ny},
+        }
@@ -0,0 +1,152 @@
+"""站点表格解析
+
+读取 Excel 站点表，解析经纬度、垃圾桶数量并生成站点ID，输出列式 DustbinStore。
+"""
+import hashlib
+import logging
+import re
+from math import isfinite, isnan
+from pathlib import Path
+
+import numpy as np
+
+from .store import BIN_CATEGORIES, DustbinStore
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def coord_to_decimal(coord_str: str | float | int) -> float | None:
+    """将经纬度字符串或数字转换为十进制度数
+    优先处理十进制格式（表格中常用的格式）
+    支持格式：
+    1. 数字类型：直接返回（最常用）
+    2. 十进制度数格式（字符串）："116.395645" 
+    3. 度分秒格式：116°23′45″ 或 116°23′（兼容格式）
+    空单元格（NaN）及无穷大视为无效，返回 None
+    """
+    if coord_str is None:
+        return None
+    
+    # 如果是数字类型，直接返回（最常见的情况）
+    if isinstance(coord_str, (int, float)):
+        return float(coord_str) if isfinite(coord_str) else None
+    
+    # 转换为字符串
+    coord_str = str(coord_str).strip()
+    if not coord_str:
+        return None
+    
+    # 优先尝试解析为十进制度数（表格中通常是这种格式）
+    try:
+        decimal = float(coord_str)
+        return decimal if isfinite(decimal) else None
+    except (ValueError, TypeError):
+        pass
+    
+    # 如果十进制解析失败，尝试解析度分秒格式（兼容旧数据）
+    # 度分秒格式：116°23′45″
+    match = re.search(r"(\d{2,3})°(\d{2,3})′(\d{2,3})″", coord_str)
+    if match:
+        degrees = int(match.group(1))
+        minutes = int(match.group(2))
+        seconds = int(match.group(3))
+        decimal = degrees + minutes / 60 + seconds / 3600
+        return decimal
+    
+    # 度分格式：116°23′
+    match = re.search(r"(\d{2,3})°(\d{2,3})′", coord_str)
+    if match:
+        degrees = int(match.group(1))
+        minutes = int(match.group(2))
+        decimal = degrees + minutes / 60
+        return decimal
+    
+    # 如果都解析失败，返回None
+    return None
+
+
+def dustbin_id_of(row: dict, name: str, lng: float, lat: float) -> str:
+    """站点ID：优先使用表格中的编号列，否则由名称和坐标生成，数据重新加载后保持不变"""
+    raw_id = row.get("站点编号") or row.get("id")
+    # 空单元格在 pandas 中读出为 NaN
+    if raw_id is not None and not (isinstance(raw_id, float) and isnan(raw_id)) and str(raw_id).strip():
+        return str(raw_id).strip()
+    digest = hashlib.sha1(f"{name}|{lng:.6f}|{lat:.6f}".encode("utf-8")).hexdigest()
+    return digest[:12]
+
+
+def empty_store() -> DustbinStore:
+    return DustbinStore([], [], np.empty(0), np.empty(0), np.empty((0, len(BIN_CATEGORIES))))
+
+
+def load_excel(path: Path) -> DustbinStore:
+    """解析站点表格（Excel），pandas 仅在此处按需导入"""
+    import pandas as pd
+
+    if not path.exists():
+        logger.warning(f"数据文件不存在: {path}")
+        return empty_store()
+    
+    logger.info(f"正在加载站点数据从: {path}")
+    
+    try:
+        records = pd.read_excel(path).to_dict(orient="records")
+    except Exception as e:
+        logger.error(f"读取数据文件失败: {e}")
+        return empty_store()
+
+    ids: list[str] = []
+    names: list[str] = []
+    lngs: list[float] = []
+    lats: list[float] = []
+    counts: list[list[int]] = []
+    seen_ids: set[str] = set()
+    base_occurrences: dict[str, int] = {}
+    skipped_count = 0
+    
+    for idx, row in enumerate(records):
+        lng_raw = row.get("经度") or row.get("lng") or row.get("longitude")
+        lat_raw = row.get("纬度") or row.get("lat") or row.get("latitude")
+        
+        lng = coord_to_decimal(lng_raw)
+        lat = coord_to_decimal(lat_raw)
+        
+        if lng is not None and lat is not None and abs(lng) < abs(lat):
+            lng, lat = lat, lng
+        
+        if lng is None or lat is None:
+            skipped_count += 1
+            continue
+        
+        name = row.get("站点名称") or row.get("name") or f"站点{len(ids)+1}"
+        
+        def safe_int(val):
+            if val is None:
+                return 0
+            try:
+                if pd.isna(val):
+                    return 0
+                return int(val)
+            except (ValueError, TypeError):
+                return 0
+
+        base_id = dustbin_id_of(row, name, lng, lat)
+        # 同名同坐标的重复行按该ID第几次出现追加序号（-2、-3…），不受其他行增删的影响
+        occurrence = base_occurrences.get(base_id, 0) + 1
+        base_occurrences[base_id] = occurrence
+        dustbin_id = base_id if occurrence == 1 else f"{base_id}-{occurrence}"
+        while dustbin_id in seen_ids:
+            occurrence += 1
+            dustbin_id = f"{base_id}-{occurrence}"
+        seen_ids.add(dustbin_id)
+
+        ids.append(dustbin_id)
+        names.append(name)
+        lngs.append(lng)
+        lats.append(lat)
+        counts.append([safe_int(row.get(cat)) for cat in BIN_CATEGORIES])
+    
+    logger.info(f"站点数据加载完成: 成功加载 {len(ids)} 个站点，跳过 {skipped_count} 条无效记录")
+    return DustbinStore(
+        ids, names, np.array(lngs), np.array(lats), np.array(counts).reshape(len(ids), len(BIN_CATEGORIES))
+    )
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from pydantic import BaseModel, Field
 import os, httpx
-import re
 from fastapi.middleware.cors import CORSMiddleware
 import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 logger = logging.getLogger("uvicorn.error")
 
 
@@ -54,25 +56,19 @@ def _build_route_result_for_dustbin(db: dict, distance: float, duration: int | N
     }
 
 
-def _find_dustbin_by_coordinates(dustbin_lng: float, dustbin_lat: float) -> dict | None:
-    for db in _DUSTBINS:
-        if abs(db["lng"] - dustbin_lng) < 0.0001 and abs(db["lat"] - dustbin_lat) < 0.0001:
-            return db
-    return None
-
+def _find_dustbin_by_coordinates(stations: "StationSet", dustbin_lng: float, dustbin_lat: float) -> dict | None:
+    idx = stations.coord_index.find(dustbin_lng, dustbin_lat)
+    return None if idx is None else stations.store.row(idx)
 
-async def _fetch_single_walking_route(origin_lng: float, origin_lat: float, db: dict) -> tuple[float | None, int | None]:
-    if not AMAP_KEY or not AMAP_KEY.strip():
-        return None, None
 
+async def _request_walking_route(origin_lng: float, origin_lat: float, db: dict) -> tuple[float | None, int | None]:
     url = (
         "https://restapi.amap.com/v3/direction/walking"
         f"?origin={origin_lng},{origin_lat}&destination={db['lng']},{db['lat']}&key={AMAP_KEY}"
     )
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url)
+        response = await _amap_get(url)
 
         logger.info(f"AMAP_ROUTE_REQ to={db['name']} status={response.status_code}")
         if response.status_code != 200:
@@ -98,14 +94,169 @@ async def _fetch_single_walking_route(origin_lng: float, origin_lat: float, db:
     return None, None
 
 
+async def _request_walking_distances(
+    origin_lng: float, origin_lat: float, dbs: list[dict]
+) -> list[tuple[float | None, int | None]] | None:
+    """一次调用高德距离测量接口（type=3 步行）获取多个站点的步行距离和耗时
+
+    该接口支持多起点、单终点，因此以各站点为起点、用户位置为终点，步行距离视为对称。
+    接口整体失败时返回 None；单个站点无结果时对应位置为 (None, None)。
+    """
+    origins = "|".join(f"{db['lng']},{db['lat']}" for db in dbs)
+    url = (
+        "https://restapi.amap.com/v3/distance"
+        f"?origins={origins}&destination={origin_lng},{origin_lat}&type=3&key={AMAP_KEY}"
+    )
+
+    try:
+        response = await _amap_get(url)
+
+        logger.info(f"AMAP_DISTANCE_REQ count={len(dbs)} status={response.status_code}")
+        if response.status_code != 200:
+            logger.error(f"AMAP_DISTANCE_HTTP_ERROR status={response.status_code} body={response.text[:200]}")
+            if response.status_code >= 500:
+                raise AmapUnavailable(f"HTTP {response.status_code}")
+            return None
+
+        payload = response.json()
+        if payload.get("status") != "1":
+            logger.error(f"AMAP_DISTANCE_API_ERROR info={payload.get('info')} infocode={payload.get('infocode')}")
+            if _is_amap_service_error(payload):
+                raise AmapServiceError(payload.get("info"))
+            return None
+
+        results: list[tuple[float | None, int | None]] = [(None, None)] * len(dbs)
+        for item in payload["results"]:
+            idx = int(item["origin_id"]) - 1
+            if not 0 <= idx < len(dbs) or not item.get("distance"):
+                continue
+            results[idx] = (float(item["distance"]), int(float(item.get("duration") or 0)))
+        return results
+    except AmapUnavailable:
+        raise
+    except httpx.TimeoutException as e:
+        logger.error(f"AMAP_DISTANCE_TIMEOUT count={len(dbs)} error={e}")
+        raise AmapUnavailable(str(e)) from e
+    except httpx.TransportError as e:
+        logger.error(f"AMAP_DISTANCE_TRANSPORT_ERROR count={len(dbs)} error={type(e).__name__}: {e}")
+        raise AmapUnavailable(str(e)) from e
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f"AMAP_DISTANCE_PARSE_ERROR error={e}")
+    except Exception as e:
+        logger.error(f"AMAP_DISTANCE_REQUEST_ERROR error={type(e).__name__}: {e}")
+
+    return None
+
+
+def _amap_available() -> bool:
+    return bool(AMAP_KEY and AMAP_KEY.strip()) and _AMAP_BREAKER.available()
+
+
+async def _fetch_single_walking_route(origin_lng: float, origin_lat: float, db: dict) -> tuple[float | None, int | None]:
+    return (await _fetch_walking_routes(origin_lng, origin_lat, [db]))[0]
+
+
+async def _resolve_walking_routes(
+    origin_lng: float, origin_lat: float, dbs: list[dict], keys: list[str]
+) -> list[tuple[float | None, int | None]]:
+    """向高德查询多个站点：两个及以上时合并为一次距离测量请求，
+    个别站点无结果或批量接口返回异常数据时再逐个调用步行路线接口（接口整体不可用时不再逐个重试）；
+    成功结果写入缓存"""
+    results: list[tuple[float | None, int | None]] = [(None, None)] * len(dbs)
+
+    if AMAP_BATCH_DISTANCE and len(dbs) > 1:
+        try:
+            batch = await _request_walking_distances(origin_lng, origin_lat, dbs)
+        except AmapUnavailable as e:
+            # 接口不可用或 key 无效、配额用尽时逐个重试也不会成功，且每次都会计入熔断失败
+            logger.warning(f"AMAP_DISTANCE_UNAVAILABLE count={len(dbs)} error={e}, skip per-route requests")
+            return results
+        if batch is None:
+            logger.warning(f"AMAP_DISTANCE_FALLBACK count={len(dbs)}, using per-route requests")
+        else:
+            results = batch
+
+    pending = [i for i, r in enumerate(results) if r[0] is None]
+    fetched = await asyncio.gather(*(_request_walking_route(origin_lng, origin_lat, dbs[i]) for i in pending))
+    for i, r in zip(pending, fetched):
+        results[i] = r
+
+    await _ROUTE_CACHE.set_many({key: r for key, r in zip(keys, results) if r[0] is not None})
+    return results
+
+
+async def _fetch_walking_routes(
+    origin_lng: float, origin_lat: float, dbs: list[dict]
+) -> list[tuple[float | None, int | None]]:
+    """获取到多个站点的步行距离和耗时：先查缓存；同一 (起点网格, 站点) 已有进行中的高德请求时
+    直接等待其结果，其余站点由本请求发起一次上游查询。高德熔断或未配置 key 时只返回缓存结果"""
+    keys = [_ROUTE_CACHE.key(origin_lng, origin_lat, db["id"], db["lng"], db["lat"]) for db in dbs]
+    results: list[tuple[float | None, int | None] | None] = await _ROUTE_CACHE.get_many(keys)
+    if not _amap_available():
+        return [r if r is not None else (None, None) for r in results]
+
+    waiting: dict[int, asyncio.Future] = {}
+    own: list[int] = []
+    for i, r in enumerate(results):
+        if r is not None:
+            continue
+        inflight = _ROUTE_INFLIGHT.get(keys[i])
+        if inflight is not None:
+            waiting[i] = inflight
+        else:
+            own.append(i)
+
+    if own:
+        own_keys = [keys[i] for i in own]
+        futures = _ROUTE_INFLIGHT.lead(
+            own_keys, _resolve_walking_routes(origin_lng, origin_lat, [dbs[i] for i in own], own_keys)
+        )
+        waiting.update(zip(own, futures))
+
+    for i, fut in waiting.items():
+        # shield：本请求被取消时不影响共享同一上游调用的其他请求
+        results[i] = await asyncio.shield(fut)
+    return results
+
+
+def _offline_walking_routes(
+    stations: "StationSet", origin_lng: float, origin_lat: float, dbs: list[dict]
+) -> list[tuple[float | None, int | None]]:
+    """根据本地步行路网的预计算最短路给出步行距离，耗时按步行速度估算"""
+    if stations.walk is None:
+        return [(None, None)] * len(dbs)
+    distances = stations.walk.distances_to(origin_lng, origin_lat, [stations.store.pos[db["id"]] for db in dbs])
+    return [(None, None) if d is None else (d, round(d / WALK_SPEED_MPS)) for d in distances]
+
+
+def _pick_shortest_route(
+    dbs: list[dict], results: list[tuple[float | None, int | None]]
+) -> tuple[float, int, dict] | None:
+    best = None
+    for db, (dist, dur) in zip(dbs, results):
+        if dist is None:
+            continue
+        if best is None or dist < best[0]:
+            best = (dist, dur, db)
+    return best
+
+
 # route endpoint is registered after RouteResp is defined
 async def route_to_dustbin(
     lng: float = Query(...),
     lat: float = Query(...),
-    dustbin_lng: float = Query(...),
-    dustbin_lat: float = Query(...),
+    dustbin_lng: float | None = Query(None),
+    dustbin_lat: float | None = Query(None),
+    dustbin_id: str | None = Query(None, description="站点ID，提供时优先于坐标"),
 ):
-    target_db = _find_dustbin_by_coordinates(dustbin_lng, dustbin_lat)
+    _start_amap_budget()
+    stations = _STATIONS
+    if dustbin_id is not None:
+        target_db = stations.store.get(dustbin_id)
+    elif dustbin_lng is not None and dustbin_lat is not None:
+        target_db = _find_dustbin_by_coordinates(stations, dustbin_lng, dustbin_lat)
+    else:
+        raise HTTPException(status_code=400, detail="请提供站点ID或站点坐标")
     if target_db is None:
         raise HTTPException(status_code=404, detail="未找到指定的垃圾站点")
 
@@ -117,13 +268,132 @@ async def route_to_dustbin(
     if direct_distance < 10:
         return _build_route_result_for_dustbin(target_db, direct_distance, None, True)
 
-    route_distance, route_duration = await _fetch_single_walking_route(lng, lat, target_db)
+    route_distance, route_duration = None, None
+    if AMAP_REFINE or stations.walk is None:
+        route_distance, route_duration = await _fetch_single_walking_route(lng, lat, target_db)
+    if route_distance is None:
+        route_distance, route_duration = _offline_walking_routes(stations, lng, lat, [target_db])[0]
+        if route_distance is not None:
+            logger.info(f"ROUTE_TO_DUSTBIN_OFFLINE target={target_db['name']} dist={round(route_distance, 1)}m")
     if route_distance is None:
         logger.warning(f"ROUTE_TO_DUSTBIN_FALLBACK target={target_db['name']}")
         return _build_route_result_for_dustbin(target_db, direct_distance, None, False)
 
     return _build_route_result_for_dustbin(target_db, route_distance, route_duration, False)
-app = FastAPI(title="Garbage Guide Service", description="垃圾投放引导后端", version="0.1.0")
+# ---------------- 出站 HTTP 连接池 --------------------
+# 整个应用生命周期共用一个 AsyncClient，复用到高德的 TCP/TLS 连接
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("AMAP_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("AMAP_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("AMAP_KEEPALIVE_EXPIRY", "30")),
+)
+_HTTP_TIMEOUT = float(os.getenv("AMAP_TIMEOUT", "10"))
+_HTTP2 = os.getenv("AMAP_HTTP2", "1") == "1"
+_http: httpx.AsyncClient | None = None
+
+
+def _http_client() -> httpx.AsyncClient:
+    if _http is None:
+        raise RuntimeError("HTTP 客户端未初始化，应用 lifespan 尚未启动")
+    return _http
+
+
+# ---------------- 高德调用的延迟预算、对冲与熔断 --------------------
+# 每个请求对高德的总等待时间不超过 AMAP_BUDGET_S；单次调用超过近期耗时的 p95（不低于 AMAP_HEDGE_MIN_S，
+# 样本不足时为 AMAP_HEDGE_DELAY_S）仍未返回时并行发起第二次，只有慢尾请求会多消耗配额（AMAP_HEDGE_DELAY_S 设为 0 关闭对冲）；
+# 连续失败 AMAP_BREAKER_FAILURES 次后熔断 AMAP_BREAKER_RESET_S 秒，直接走兜底
+from .resilience import CircuitBreaker, LatencyTracker, hedged
+
+AMAP_BUDGET_S = float(os.getenv("AMAP_BUDGET_S", "2.0"))
+AMAP_HEDGE_DELAY_S = float(os.getenv("AMAP_HEDGE_DELAY_S", "1.0"))
+AMAP_HEDGE_MIN_S = float(os.getenv("AMAP_HEDGE_MIN_S", "0.5"))
+_AMAP_LATENCY = LatencyTracker()
+_AMAP_BREAKER = CircuitBreaker(
+    failure_threshold=int(os.getenv("AMAP_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("AMAP_BREAKER_RESET_S", "30")),
+)
+_AMAP_DEADLINE: ContextVar[float | None] = ContextVar("amap_deadline", default=None)
+
+
+def _start_amap_budget() -> None:
+    """在请求入口处调用，本请求后续的所有高德调用共享同一个截止时间"""
+    _AMAP_DEADLINE.set(time.monotonic() + AMAP_BUDGET_S)
+
+
+def _amap_hedge_delay() -> float:
+    p95 = _AMAP_LATENCY.quantile(0.95)
+    return AMAP_HEDGE_DELAY_S if p95 is None else max(p95, AMAP_HEDGE_MIN_S)
+
+
+class AmapUnavailable(Exception):
+    """高德接口整体不可用（连接失败、超时、5xx 等），此时逐个重试也不会成功"""
+
+
+class AmapServiceError(AmapUnavailable):
+    """高德返回 key 无效、配额用尽、并发超限等账号/服务级错误"""
+
+
+def _is_amap_service_error(payload: dict) -> bool:
+    # 100xx 为 key、配额、QPS 及服务可用性相关的错误码（如 10003 日调用量超限），与具体请求参数无关
+    return payload.get("status") != "1" and str(payload.get("infocode", "")).startswith("100")
+
+
+def _response_is_service_error(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    try:
+        payload = response.json()
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and _is_amap_service_error(payload)
+
+
+async def _amap_get(url: str) -> httpx.Response:
+    deadline = _AMAP_DEADLINE.get()
+    budget = AMAP_BUDGET_S if deadline is None else deadline - time.monotonic()
+    if budget <= 0:
+        # 预算已被本请求之前的调用用完，不算作高德故障
+        raise httpx.TimeoutException("本请求的高德调用延迟预算已用完")
+    if not _AMAP_BREAKER.allow():
+        raise httpx.ConnectError("高德接口已熔断，跳过调用")
+
+    started = time.monotonic()
+    try:
+        if AMAP_HEDGE_DELAY_S > 0:
+            response = await hedged(lambda: _http_client().get(url), _amap_hedge_delay(), budget)
+        else:
+            response = await asyncio.wait_for(_http_client().get(url), budget)
+    except asyncio.TimeoutError:
+        _AMAP_BREAKER.record_failure()
+        raise httpx.TimeoutException(f"超出高德调用延迟预算 {AMAP_BUDGET_S}s")
+    except Exception:
+        _AMAP_BREAKER.record_failure()
+        raise
+
+    # 配额用尽等错误以 HTTP 200 + status "0" 返回，同样计为失败，使熔断器能够打开
+    if response.status_code >= 500 or _response_is_service_error(response):
+        _AMAP_BREAKER.record_failure()
+    else:
+        _AMAP_BREAKER.record_success()
+        _AMAP_LATENCY.record(time.monotonic() - started)
+    return response
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _http
+    _http = httpx.AsyncClient(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS, http2=_HTTP2)
+    watcher = asyncio.create_task(_watch_data_file()) if DUSTBIN_WATCH_INTERVAL_S > 0 else None
+    try:
+        yield
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        await _http.aclose()
+        _http = None
+
+
+app = FastAPI(title="Garbage Guide Service", description="垃圾投放引导后端", version="0.1.0", lifespan=lifespan)
 
 # 允许所有来源跨域，生产环境可限定具体域名
 app.add_middleware(
@@ -135,18 +405,26 @@ app.add_middleware(
 
 AMAP_KEY = os.getenv("AMAP_API_KEY", "2c96a8ea85096b49090551970ed6199c")
 
-# ------------------- 工具函数 ----------------------
-from math import radians, sin, cos, sqrt, atan2
+# 批量距离测量：/nearest 的多个候选站点合并为一次高德请求，失败时回退逐个请求
+AMAP_BATCH_DISTANCE = os.getenv("AMAP_BATCH_DISTANCE", "1") == "1"
 
+# 步行路线缓存：起点吸附网格边长、TTL、容量可配置，设置 ROUTE_CACHE_REDIS_URL 时多 worker 共享（需安装可选依赖 redis）
+from .route_cache import RouteCache, SingleFlight
 
-def _haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
-    """计算两坐标间球面距离（米）"""
-    R = 6371000.0  # 地球半径
-    dlon = radians(lon2 - lon1)
-    dlat = radians(lat2 - lat1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
+_ROUTE_CACHE = RouteCache(
+    maxsize=int(os.getenv("ROUTE_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("ROUTE_CACHE_TTL", "3600")),
+    origin_cell_m=float(os.getenv("ROUTE_CACHE_CELL_M", "15")),
+    redis_url=os.getenv("ROUTE_CACHE_REDIS_URL") or None,
+)
+# 相同 (起点网格, 站点) 的并发高德请求合并为一次
+_ROUTE_INFLIGHT = SingleFlight()
+
+# ------------------- 工具函数 ----------------------
+from .coverage import CoverageGrid
+from .spatial import CoordIndex, GridIndex, haversine as _haversine, haversine_many, nearest_many
+from .store import BIN_CATEGORIES, DustbinStore, normalize_category
+from .walk_graph import load_walk_graph
 
 
 def _format_duration(seconds: int) -> str:
@@ -163,25 +441,14 @@ def _format_duration(seconds: int) -> str:
         return f"{minutes}分{remaining_seconds}秒"
 
 
-def _build_bin_description(bin_types: dict) -> str:
-    """根据垃圾桶类型生成描述（B风格：说明式）"""
-    categories = []
-    for cat in ["可回收", "厨余", "有害", "其他"]:
-        count = bin_types.get(cat, 0)
-        if count and count > 0:
-            categories.append(cat)
-    
-    if not categories:
-        return "无分类垃圾桶"
-    
-    if len(categories) >= 4:
-        return "配有可回收、厨余、有害、其他垃圾桶"
-    
-    return "配有" + "、".join(categories) + "垃圾桶"
-
 # ---------------- 加载 CSV / Excel 站点数据 --------------------
 from pathlib import Path
-import csv, pandas as pd
+import gzip, hashlib, json, numpy as np
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只提供 gzip 版本
+    brotli = None
 
 # 支持通过环境变量自定义路径
 _default_xlsx = Path("/code/data/dustbins_with_types.xlsx")
@@ -191,133 +458,245 @@ if env_path:
 else:
     DATA_PATH = _default_xlsx
 
-# 正则与 _coord_to_decimal 定义（保持已存在代码）
+from .loader import empty_store, load_excel
+from .snapshot import load_snapshot, write_snapshot
 
+# 预编译的二进制快照：存在且与数据表一致时直接加载，无需 pandas 解析 Excel
+SNAPSHOT_PATH = Path(os.getenv("DUSTBIN_SNAPSHOT") or DATA_PATH.with_suffix(".usnap"))
+# 从 Excel 加载后自动写出快照，供下次启动（或其他副本）直接使用
+SNAPSHOT_AUTO_WRITE = os.getenv("DUSTBIN_SNAPSHOT_AUTO", "1") == "1"
 
-def _coord_to_decimal(coord_str: str | float | int) -> float | None:
-    """将经纬度字符串或数字转换为十进制度数
-    优先处理十进制格式（表格中常用的格式）
-    支持格式：
-    1. 数字类型：直接返回（最常用）
-    2. 十进制度数格式（字符串）："116.395645" 
-    3. 度分秒格式：116°23′45″ 或 116°23′（兼容格式）
+
+def _load_dustbins() -> DustbinStore:
+    if not DATA_PATH.exists() and not SNAPSHOT_PATH.exists():
+        logger.warning(f"数据文件不存在: {DATA_PATH}")
+        return empty_store()
+
+    store = load_snapshot(SNAPSHOT_PATH, DATA_PATH)
+    if store is not None:
+        logger.info(f"站点数据从快照加载完成: {SNAPSHOT_PATH}，共 {len(store)} 个站点")
+        return store
+
+    store = load_excel(DATA_PATH)
+    if store and SNAPSHOT_AUTO_WRITE:
+        try:
+            write_snapshot(store, SNAPSHOT_PATH, DATA_PATH)
+        except OSError as e:
+            logger.warning(f"写入站点快照失败: {e}")
+    return store
+
+
+# ---------------- 本地步行路网（可选） --------------------
+# 配置 WALK_GRAPH_PATH（.csv 边表或 .osm）后可离线给出步行距离；
+# AMAP_REFINE=0 时完全不调用高德，否则高德结果优先，失败时回退到路网距离
+WALK_GRAPH_PATH = os.getenv("WALK_GRAPH_PATH")
+WALK_GRAPH_MAX_SNAP_M = float(os.getenv("WALK_GRAPH_MAX_SNAP_M", "150"))
+WALK_SPEED_MPS = float(os.getenv("WALK_SPEED_MPS", "1.1"))
+AMAP_REFINE = os.getenv("AMAP_REFINE", "1") == "1"
+
+_WALK_GRAPH = load_walk_graph(Path(WALK_GRAPH_PATH)) if WALK_GRAPH_PATH else None
+
+# ---------------- 站点服务范围栅格 --------------------
+# 加载数据时预先计算每个网格的候选站点，/nearest 查表即可得到前 k 近站点；
+# 同时导出各站点服务范围供 /coverage 使用。COVERAGE_CELL_M=0 时关闭
+COVERAGE_CELL_M = float(os.getenv("COVERAGE_CELL_M", "20"))
+COVERAGE_MARGIN_M = float(os.getenv("COVERAGE_MARGIN_M", "300"))
+COVERAGE_MAX_CELLS = int(os.getenv("COVERAGE_MAX_CELLS", "250000"))
+NEAREST_CANDIDATES = 5
+
+
+class _PrecomputedBody:
+    """接口响应的序列化结果（站点列表、服务范围），加载数据时生成一次，按 Accept-Encoding 返回对应压缩版本"""
+
+    def __init__(self, payload):
+        self.body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        self.variants: dict[str, tuple[bytes, str]] = {"identity": (self.body, f'"{digest}"')}
+        self.variants["gzip"] = (gzip.compress(self.body, compresslevel=9), f'"{digest}-gzip"')
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(self.body), f'"{digest}-br"')
+        self.etags = {etag for _, etag in self.variants.values()}
+
+    def negotiate(self, accept_encoding: str) -> str:
+        accepted = set()
+        for part in accept_encoding.split(","):
+            token, _, params = part.partition(";")
+            params = params.replace(" ", "")
+            try:
+                q = float(params[2:]) if params.startswith("q=") else 1.0
+            except ValueError:
+                q = 1.0
+            if q > 0:
+                accepted.add(token.strip().lower())
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def matches(self, if_none_match: str) -> bool:
+        if if_none_match.strip() == "*":
+            return True
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return not tags.isdisjoint(self.etags)
+
+
+class StationSet:
+    """某一版本的站点数据及其全部派生索引；构建完成后只读，重新加载时整体原子替换。
+
+    请求处理开始时取一次 _STATIONS 的引用并全程使用，因此替换不会影响进行中的请求。
     """
-    if coord_str is None:
-        return None
-    
-    # 如果是数字类型，直接返回（最常见的情况）
-    if isinstance(coord_str, (int, float)):
-        return float(coord_str)
-    
-    # 转换为字符串
-    coord_str = str(coord_str).strip()
-    if not coord_str:
-        return None
-    
-    # 优先尝试解析为十进制度数（表格中通常是这种格式）
+
+    def __init__(self, store: DustbinStore, version: int, source_mtime: float | None):
+        self.store = store
+        self.version = version
+        self.source_mtime = source_mtime
+        self.loaded_at = time.time()
+        points = store.points()
+        # 网格索引供 /nearest 做 k 近邻查询，坐标哈希索引供 /route 按坐标反查
+        self.index = GridIndex(points)
+        self.coord_index = CoordIndex(points)
+        # 每类垃圾桶单独建一个索引（只含该类数量>0的站点），按类别查询时不退化为全量扫描
+        self.category_index: dict[str, tuple[GridIndex, np.ndarray]] = {}
+        for col, category in enumerate(BIN_CATEGORIES):
+            members = np.flatnonzero(store.counts[:, col] > 0)
+            self.category_index[category] = (GridIndex([points[i] for i in members.tolist()]), members)
+        self.walk = (
+            _WALK_GRAPH.station_distances(points, WALK_GRAPH_MAX_SNAP_M) if _WALK_GRAPH is not None else None
+        )
+        self.body = _PrecomputedBody(store.records())
+        self.coverage = None
+        self.coverage_body = None
+        if store and COVERAGE_CELL_M > 0:
+            self.coverage = CoverageGrid(
+                store.lng,
+                store.lat,
+                k=NEAREST_CANDIDATES,
+                cell_m=COVERAGE_CELL_M,
+                margin_m=COVERAGE_MARGIN_M,
+                max_cells=COVERAGE_MAX_CELLS,
+            )
+            names = [store.name_table[i] for i in store.name_idx.tolist()]
+            self.coverage_body = _PrecomputedBody(self.coverage.geojson(store.ids, names))
+
+    def k_nearest(self, lng: float, lat: float, k: int, category: str | None = None) -> list[tuple[float, int]]:
+        """返回最近的 k 个站点 [(直线距离, 站点下标)]；指定 category 时只在有该类垃圾桶的站点中查找"""
+        if category is None:
+            candidates = None
+            if self.coverage is not None and k <= self.coverage.k:
+                candidates = self.coverage.candidates_at(lng, lat)
+            if candidates is None:
+                return self.index.k_nearest(lng, lat, k)
+            # 命中服务范围栅格：只需对该网格的少量候选计算精确距离
+            dist = haversine_many(lng, lat, self.store.lng[candidates], self.store.lat[candidates])
+            order = np.argsort(dist, kind="stable")[:k]
+            return [(float(dist[i]), int(candidates[i])) for i in order.tolist()]
+        index, members = self.category_index[category]
+        return [(dist, int(members[i])) for dist, i in index.k_nearest(lng, lat, k)]
+
+
+def _data_mtime() -> float | None:
     try:
-        decimal = float(coord_str)
-        return decimal
-    except (ValueError, TypeError):
-        pass
-    
-    # 如果十进制解析失败，尝试解析度分秒格式（兼容旧数据）
-    # 度分秒格式：116°23′45″
-    match = re.search(r"(\d{2,3})°(\d{2,3})′(\d{2,3})″", coord_str)
-    if match:
-        degrees = int(match.group(1))
-        minutes = int(match.group(2))
-        seconds = int(match.group(3))
-        decimal = degrees + minutes / 60 + seconds / 3600
-        return decimal
-    
-    # 度分格式：116°23′
-    match = re.search(r"(\d{2,3})°(\d{2,3})′", coord_str)
-    if match:
-        degrees = int(match.group(1))
-        minutes = int(match.group(2))
-        decimal = degrees + minutes / 60
-        return decimal
-    
-    # 如果都解析失败，返回None
-    return None
+        return DATA_PATH.stat().st_mtime
+    except OSError:
+        return None
 
 
-def _load_dustbins() -> list[dict]:
-    if not DATA_PATH.exists():
-        logger.warning(f"数据文件不存在: {DATA_PATH}")
-        return []
-    
-    logger.info(f"正在加载站点数据从: {DATA_PATH}")
-    
-    try:
-        records = pd.read_excel(DATA_PATH).to_dict(orient="records")
-    except Exception as e:
-        logger.error(f"读取数据文件失败: {e}")
-        return []
+def _build_station_set(version: int) -> StationSet:
+    mtime = _data_mtime()
+    return StationSet(_load_dustbins(), version, mtime)
 
-    bins: list[dict] = []
-    skipped_count = 0
-    
-    for idx, row in enumerate(records):
-        lng_raw = row.get("经度") or row.get("lng") or row.get("longitude")
-        lat_raw = row.get("纬度") or row.get("lat") or row.get("latitude")
-        
-        lng = _coord_to_decimal(lng_raw)
-        lat = _coord_to_decimal(lat_raw)
-        
-        if lng is not None and lat is not None and abs(lng) < abs(lat):
-            lng, lat = lat, lng
-        
-        if lng is None or lat is None:
-            skipped_count += 1
-            continue
-        
-        name = row.get("站点名称") or row.get("name") or f"站点{len(bins)+1}"
-        
-        def safe_int(val):
-            if val is None:
-                return 0
-            try:
-                if pd.isna(val):
-                    return 0
-                return int(val)
-            except (ValueError, TypeError):
-                return 0
-
-        bin_types = {
-            "其他": safe_int(row.get("其他")),
-            "可回收": safe_int(row.get("可回收")),
-            "厨余": safe_int(row.get("厨余")),
-            "有害": safe_int(row.get("有害")),
-        }
-        description = _build_bin_description(bin_types)
-        
-        bins.append({
-            "name": name,
-            "lng": lng,
-            "lat": lat,
-            "bin_types": bin_types,
-            "description": description,
-        })
-    
-    logger.info(f"站点数据加载完成: 成功加载 {len(bins)} 个站点，跳过 {skipped_count} 条无效记录")
-    return bins
 
+_STATIONS = _build_station_set(1)
 
-_DUSTBINS = _load_dustbins()
+# ---------------- 站点数据热更新 --------------------
+# 数据文件变化（每 DUSTBIN_WATCH_INTERVAL_S 秒检查一次，0 为关闭）或调用 /admin/reload 时，
+# 在后台线程中重建站点数据和索引，完成后替换 _STATIONS；/admin/reload 需设置 GUIDE_ADMIN_TOKEN 并携带 X-Admin-Token，未设置时不开放
+DUSTBIN_WATCH_INTERVAL_S = float(os.getenv("DUSTBIN_WATCH_INTERVAL_S", "10"))
+GUIDE_ADMIN_TOKEN = os.getenv("GUIDE_ADMIN_TOKEN")
+_RELOAD_LOCK = asyncio.Lock()
+_last_seen_mtime = _STATIONS.source_mtime
+
+
+async def reload_stations(reason: str) -> StationSet:
+    global _STATIONS, _last_seen_mtime
+    async with _RELOAD_LOCK:
+        current = _STATIONS
+        started = time.monotonic()
+        attempted_mtime = _data_mtime()
+        try:
+            new_set = await asyncio.to_thread(_build_station_set, current.version + 1)
+        except Exception:
+            # 记录本次失败的文件版本，文件再次变化前不再重复解析
+            _last_seen_mtime = attempted_mtime
+            raise
+        _last_seen_mtime = new_set.source_mtime
+        if not new_set.store and current.store:
+            # 文件读取失败或为空（例如正在写入），保留旧数据
+            logger.warning(f"DUSTBIN_RELOAD_SKIPPED reason={reason} new data is empty, keep version={current.version}")
+            return current
+        _STATIONS = new_set
+        _ROUTE_CACHE.clear()
+        logger.info(
+            f"DUSTBIN_RELOADED reason={reason} version={new_set.version} bins={len(new_set.store)} "
+            f"took={round(time.monotonic() - started, 3)}s"
+        )
+        return new_set
+
+
+async def _watch_data_file() -> None:
+    while True:
+        await asyncio.sleep(DUSTBIN_WATCH_INTERVAL_S)
+        mtime = _data_mtime()
+        if mtime is not None and mtime != _last_seen_mtime:
+            try:
+                await reload_stations("file_changed")
+            except Exception as e:
+                logger.error(f"DUSTBIN_RELOAD_ERROR {type(e).__name__}: {e}", exc_info=True)
 
 class Dustbin(BaseModel):
+    id: str
     name: str
     lng: float
     lat: float
     bin_types: dict
     description: str
 
+
+
 @app.get("/dustbins", response_model=list[Dustbin])
-async def list_dustbins():
-    """返回校园内所有垃圾桶坐标(示例数据)"""
-    return _DUSTBINS
+async def list_dustbins(request: Request):
+    """返回校园内所有垃圾桶坐标(示例数据)
+
+    响应体在加载数据时预先序列化并压缩，带强 ETag；客户端携带 If-None-Match 命中时返回 304。
+    """
+    return _precomputed_response(request, _STATIONS.body)
+
+
+@app.get("/coverage")
+async def station_coverage(request: Request):
+    """各站点服务范围（GeoJSON FeatureCollection）
+
+    每个网格归属于距其最近的站点，同一站点的网格合并为 MultiPolygon，properties 中给出
+    网格数和面积(平方米)，可用于查看覆盖空白或服务范围过大的站点。
+    """
+    cached = _STATIONS.coverage_body
+    if cached is None:
+        raise HTTPException(status_code=404, detail="服务范围未启用或无可用垃圾桶数据")
+    return _precomputed_response(request, cached, media_type="application/geo+json")
+
+
+def _precomputed_response(request: Request, cached: _PrecomputedBody, media_type: str = "application/json") -> Response:
+    encoding = cached.negotiate(request.headers.get("accept-encoding", ""))
+    body, etag = cached.variants[encoding]
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and cached.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
 
 class RouteResp(BaseModel):
     nearby: bool = Field(..., description="是否近距离无需导航")
@@ -330,22 +709,110 @@ class RouteResp(BaseModel):
 
 app.get("/route", response_model=RouteResp)(route_to_dustbin)
 
+
+NEAREST_BATCH_MAX = int(os.getenv("NEAREST_BATCH_MAX", "20000"))
+
+
+class Origin(BaseModel):
+    lng: float
+    lat: float
+
+
+class NearestBatchReq(BaseModel):
+    origins: list[Origin] = Field(..., description="用户坐标列表")
+
+
+class NearestBatchItem(BaseModel):
+    lng: float
+    lat: float
+    dustbin_id: str
+    name: str
+    distance: float = Field(..., description="直线距离(米)")
+
+
+@app.post("/nearest/batch", response_model=list[NearestBatchItem])
+async def nearest_dustbin_batch(req: NearestBatchReq):
+    """批量查询多个坐标各自的最近垃圾桶（直线距离，不调用高德），结果与输入顺序一致"""
+    store = _STATIONS.store
+    if not store:
+        raise HTTPException(status_code=500, detail="无可用垃圾桶数据")
+    if len(req.origins) > NEAREST_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"单次最多查询 {NEAREST_BATCH_MAX} 个坐标")
+    if not req.origins:
+        return []
+
+    origin_lng = np.array([o.lng for o in req.origins], dtype=np.float64)
+    origin_lat = np.array([o.lat for o in req.origins], dtype=np.float64)
+    # 大批量计算放到线程中，避免阻塞事件循环
+    idx, dist = await asyncio.to_thread(nearest_many, origin_lng, origin_lat, store.lng, store.lat)
+    logger.info(f"NEAREST_BATCH origins={len(req.origins)}")
+
+    return [
+        {
+            "lng": o.lng,
+            "lat": o.lat,
+            "dustbin_id": store.ids[i],
+            "name": store.name(i),
+            "distance": round(d, 1),
+        }
+        for o, i, d in zip(req.origins, idx.tolist(), dist.tolist())
+    ]
+
+
+@app.post("/admin/reload")
+async def admin_reload(request: Request):
+    """手动触发站点数据重新加载（后台构建完成后原子替换）"""
+    if not GUIDE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="未启用")
+    if request.headers.get("x-admin-token") != GUIDE_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="无权限")
+    stations = await reload_stations("admin")
+    return {"version": stations.version, "dustbins": len(stations.store), "loaded_at": stations.loaded_at}
+
+
+@app.get("/health")
+async def health():
+    """服务健康状态及高德熔断器状态"""
+    return {
+        "status": "ok",
+        "dustbins": len(_STATIONS.store),
+        "data_version": _STATIONS.version,
+        "amap_breaker": _AMAP_BREAKER.snapshot(),
+    }
+
+
+@app.get("/cache/stats")
+async def route_cache_stats():
+    """步行路线缓存命中及并发请求合并统计"""
+    return {**_ROUTE_CACHE.stats(), "single_flight": _ROUTE_INFLIGHT.stats()}
+
 @app.get("/nearest", response_model=RouteResp)
-async def nearest_dustbin(lng: float = Query(...), lat: float = Query(...)):
+async def nearest_dustbin(
+    lng: float = Query(...),
+    lat: float = Query(...),
+    category: str | None = Query(None, description="垃圾类别（可回收/厨余/有害/其他，也可带“垃圾”“物”后缀），只返回有该类垃圾桶的站点"),
+):
     """根据用户坐标，返回最近垃圾桶及步行距离时间"""
-    logger.info(f"NEAREST called lng={lng} lat={lat} bins={len(_DUSTBINS)} key={'set' if AMAP_KEY!='dea7cc14dad7340b0c4e541dfa3d27b7' else 'none'}")
+    _start_amap_budget()
+    stations = _STATIONS
+    logger.info(f"NEAREST called lng={lng} lat={lat} category={category} bins={len(stations.store)} key={'set' if AMAP_KEY!='dea7cc14dad7340b0c4e541dfa3d27b7' else 'none'}")
 
-    if not _DUSTBINS:
+    if not stations.store:
         raise HTTPException(status_code=500, detail="无可用垃圾桶数据")
 
-    # 计算所有站点的直线距离并排序
-    candidates = sorted(
-        (
-            (_haversine(lng, lat, db["lng"], db["lat"]), db)
-            for db in _DUSTBINS
-        ),
-        key=lambda x: x[0],
-    )
+    bin_category = None
+    if category is not None:
+        bin_category = normalize_category(category)
+        if bin_category is None:
+            raise HTTPException(status_code=400, detail=f"未知的垃圾类别: {category}")
+
+    # 取直线距离最近的5个候选站点（优先查服务范围栅格，指定类别时使用该类别的索引）
+    candidates = [
+        (dist, stations.store.row(idx))
+        for dist, idx in stations.k_nearest(lng, lat, NEAREST_CANDIDATES, bin_category)
+    ]
+    if not candidates:
+        raise HTTPException(status_code=404, detail=f"没有配备{bin_category}垃圾桶的站点")
 
     # 获取最近的垃圾桶
     nearest_dist, nearest_db = candidates[0]
@@ -364,55 +831,18 @@ async def nearest_dustbin(lng: float = Query(...), lat: float = Query(...)):
             "deeplink": None,
         }
 
-    # 距离>=10米，调用高德API获取步行路线（对前5个候选点）
+    # 距离>=10米，调用高德API获取步行路线（对前5个候选点，命中缓存时不再请求）
+    candidate_dbs = [db for _, db in candidates]
     best = None
-    if AMAP_KEY and AMAP_KEY.strip():
+    if AMAP_REFINE or stations.walk is None:
         logger.info(f"DISTANCE >=10m, calling Amap API for top 5 candidates")
-        try:
-            # 增加超时时间到10秒，避免Swagger调用时因网络稍慢而超时
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                async def fetch(db):
-                    url = (
-                        "https://restapi.amap.com/v3/direction/walking"
-                        f"?origin={lng},{lat}&destination={db['lng']},{db['lat']}&key={AMAP_KEY}"
-                    )
-                    try:
-                        r = await client.get(url)
-                        logger.info(f"AMAP_REQ to={db['name']} status={r.status_code}")
-                        if r.status_code != 200:
-                            logger.error(f"AMAP_ERROR status={r.status_code} body={r.text[:200]}")
-                            return db, None
-                        json_data = r.json()
-                        if json_data.get("status") != "1":
-                            logger.error(f"AMAP_API_ERROR to={db['name']} info={json_data.get('info')} infocode={json_data.get('infocode')}")
-                        return db, json_data
-                    except httpx.TimeoutException as e:
-                        logger.error(f"AMAP_TIMEOUT to={db['name']} error={e}")
-                        return db, None
-                    except Exception as e:
-                        logger.error(f"AMAP_REQUEST_ERROR to={db['name']} error={type(e).__name__}: {e}")
-                        return db, None
-
-                # 只对前5个候选调用API
-                top5_candidates = candidates[:5]
-                results = await asyncio.gather(*(fetch(db) for _, db in top5_candidates))
-
-                for db, data in results:
-                    if not data or data.get("status") != "1":
-                        continue
-                    try:
-                        route = data["route"]["paths"][0]
-                        dist = float(route["distance"])
-                        dur = float(route["duration"])
-                        logger.info(f"AMAP_SUCCESS to={db['name']} dist={dist}m dur={dur}s")
-                        if best is None or dist < best[0]:
-                            best = (dist, dur, db)
-                    except (KeyError, IndexError, ValueError) as e:
-                        logger.error(f"AMAP_PARSE_ERROR db={db['name']} error={e} data={data}")
-                        continue
-        except Exception as e:
-            logger.error(f"AMAP_FAIL {type(e).__name__}: {e}", exc_info=True)
-            best = None
+        best = _pick_shortest_route(candidate_dbs, await _fetch_walking_routes(lng, lat, candidate_dbs))
+
+    if best is None and stations.walk is not None:
+        # 高德不可用或未启用时，使用本地步行路网的预计算距离
+        best = _pick_shortest_route(candidate_dbs, _offline_walking_routes(stations, lng, lat, candidate_dbs))
+        if best is not None:
+            logger.info(f"NEAREST_OFFLINE to={best[2]['name']} dist={round(best[0], 1)}m")
 
     if best is None:
         # 无高德结果，返回最近垃圾桶的直线距离估算
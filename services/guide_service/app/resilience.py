@@ -0,0 +1,114 @@
+"""上游调用的延迟控制：对冲请求与熔断器"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后熔断，在 reset_timeout 秒内直接跳过上游；
+    到期后进入半开状态，只放行一个探测请求，成功则恢复，失败则重新熔断。"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.total_failures = 0
+        self.total_short_circuits = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        """只读判断当前是否值得尝试上游（不占用半开探测名额）"""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._probing)
+
+    def allow(self) -> bool:
+        """发起调用前调用；半开状态下只有第一个调用者获得探测名额"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True
+            return True
+        self.total_short_circuits += 1
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self.total_failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "total_failures": self.total_failures,
+            "total_short_circuits": self.total_short_circuits,
+        }
+
+
+class LatencyTracker:
+    """记录最近 window 次成功调用的耗时，用于按分位数确定对冲延迟"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """样本不足 min_samples 时返回 None"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def hedged(call: Callable[[], Awaitable[T]], hedge_delay: float, timeout: float) -> T:
+    """先发起一次调用，hedge_delay 秒内未返回（或已失败）时再并行发起第二次，
+    取先成功的结果；超过 timeout 抛出 asyncio.TimeoutError，未完成的调用会被取消。"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    tasks: set[asyncio.Future] = {asyncio.ensure_future(call())}
+    attempts = 1
+    last_error: BaseException | None = None
+    try:
+        while tasks:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            wait = min(hedge_delay, remaining) if attempts == 1 else remaining
+            done, _ = await asyncio.wait(tasks, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+            if attempts == 1:
+                tasks.add(asyncio.ensure_future(call()))
+                attempts += 1
+        raise last_error
+    finally:
+        for task in tasks:
+            task.cancel()
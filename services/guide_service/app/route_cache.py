@@ -0,0 +1,175 @@
+"""步行路线缓存
+
+同一走廊/路口附近的用户到同一站点的步行路线几乎相同，因此把起点吸附到
+固定边长的网格，以 (网格, 站点ID, 站点坐标) 为键缓存高德返回的距离与耗时。
+站点坐标也是键的一部分：重新加载后被移动的站点不会再命中旧路线（包括 Redis 中尚未过期的条目）。
+进程内为带 TTL 的 LRU；配置 Redis 时作为多个 uvicorn worker 共享的二级缓存。
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from math import cos, radians
+from typing import Awaitable
+
+logger = logging.getLogger("uvicorn.error")
+
+# 纬度 1 度对应的米数（近似）
+_METERS_PER_DEG_LAT = 111320.0
+
+
+class RouteCache:
+    def __init__(
+        self,
+        maxsize: int = 10000,
+        ttl: float = 3600.0,
+        origin_cell_m: float = 15.0,
+        redis_url: str | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.origin_cell_m = origin_cell_m
+        self._entries: OrderedDict[str, tuple[float, tuple[float, int]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self._redis = None
+        if redis_url:
+            # 仅在配置了共享缓存时才引入 redis 依赖（需另行 pip install redis）
+            import redis.asyncio as redis
+
+            self._redis = redis.from_url(redis_url)
+
+    def key(self, origin_lng: float, origin_lat: float, dustbin_id: str, dest_lng: float, dest_lat: float) -> str:
+        """起点吸附到 origin_cell_m 米的网格后与站点ID、站点坐标组成缓存键"""
+        dlat = self.origin_cell_m / _METERS_PER_DEG_LAT
+        iy = round(origin_lat / dlat)
+        dlng = self.origin_cell_m / (_METERS_PER_DEG_LAT * max(cos(radians(iy * dlat)), 1e-6))
+        ix = round(origin_lng / dlng)
+        return f"route:{self.origin_cell_m:g}:{ix}:{iy}:{dustbin_id}:{dest_lng:.6f},{dest_lat:.6f}"
+
+    def _get_local(self, key: str) -> tuple[float, int] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expire_at, value = entry
+        if expire_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: tuple[float, int]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> tuple[float, int] | None:
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: list[str]) -> list[tuple[float, int] | None]:
+        """批量查询；进程内未命中的键用一次 MGET 到共享缓存查询"""
+        values = [self._get_local(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+
+        if missing and self._redis is not None:
+            try:
+                raws = await self._redis.mget([keys[i] for i in missing])
+            except Exception as e:
+                logger.warning(f"ROUTE_CACHE_SHARED_GET_ERROR keys={len(missing)} error={type(e).__name__}: {e}")
+                raws = [None] * len(missing)
+            for i, raw in zip(missing, raws):
+                if raw is None:
+                    continue
+                try:
+                    distance, duration = raw.decode().split(",")
+                    value = (float(distance), int(duration))
+                except ValueError:
+                    logger.warning(f"ROUTE_CACHE_SHARED_BAD_VALUE key={keys[i]} value={raw!r}")
+                    continue
+                self._set_local(keys[i], value)
+                values[i] = value
+                self.shared_hits += 1
+
+        hits = sum(value is not None for value in values)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return values
+
+    async def set(self, key: str, value: tuple[float, int]) -> None:
+        await self.set_many({key: value})
+
+    async def set_many(self, items: dict[str, tuple[float, int]]) -> None:
+        for key, value in items.items():
+            self._set_local(key, value)
+        if self._redis is not None and items:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for key, value in items.items():
+                        pipe.set(key, f"{value[0]},{value[1]}", ex=int(self.ttl))
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"ROUTE_CACHE_SHARED_SET_ERROR keys={len(items)} error={type(e).__name__}: {e}")
+
+    def clear(self) -> None:
+        """清空进程内缓存（站点数据更新后调用）"""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "origin_cell_m": self.origin_cell_m,
+            "shared": self._redis is not None,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class SingleFlight:
+    """合并同一键的并发上游请求：同一时刻每个键只有一个进行中的调用，后来者等待其结果
+
+    上游调用在独立任务中执行，发起者所在的请求被取消（如客户端断开）时不会影响其他等待者。
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def get(self, key: str) -> asyncio.Future | None:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+        return fut
+
+    def lead(self, keys: list[str], coro: Awaitable[list]) -> list[asyncio.Future]:
+        """由一次上游调用 coro 负责 keys 中的全部键，coro 需返回与 keys 等长的结果列表"""
+        loop = asyncio.get_running_loop()
+        task = asyncio.ensure_future(coro)
+        futures = [loop.create_future() for _ in keys]
+        for key, fut in zip(keys, futures):
+            self._inflight[key] = fut
+        self.leaders += 1
+
+        def _distribute(t: asyncio.Task) -> None:
+            for i, (key, fut) in enumerate(zip(keys, futures)):
+                if self._inflight.get(key) is fut:
+                    del self._inflight[key]
+                if t.cancelled():
+                    fut.cancel()
+                elif t.exception() is not None:
+                    fut.set_exception(t.exception())
+                else:
+                    fut.set_result(t.result()[i])
+
+        task.add_done_callback(_distribute)
+        return futures
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "leaders": self.leaders, "coalesced": self.coalesced}
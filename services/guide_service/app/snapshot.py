@@ -0,0 +1,146 @@
+"""站点数据二进制快照
+
+把解析后的站点数据编译为紧凑的二进制文件，启动时直接内存映射加载，
+无需导入 pandas/openpyxl 解析 Excel。
+
+文件格式::
+
+    MAGIC(8 字节) | 头部长度(uint32 小端) | 头部 JSON | 填充到 8 字节对齐 | 数组数据
+
+头部记录站点ID、名称表、各数组的偏移/类型/形状、数据表的 sha256 以及内容校验和。
+数据表内容变化（sha256 不一致）或校验失败时视为快照失效。
+
+编译快照::
+
+    python -m app.snapshot data/dustbins_with_types.xlsx data/dustbins_with_types.usnap
+"""
+import hashlib
+import json
+import logging
+import os
+import struct
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from .store import DustbinStore
+
+logger = logging.getLogger("uvicorn.error")
+
+MAGIC = b"USNAP\x00\x01\x00"
+FORMAT_VERSION = 2
+_ALIGN = 8
+
+
+def _file_sha256(path: Path) -> str | None:
+    if not path.exists():
+        return None
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _checksum(ids: list[str], name_table: list[str], payload: bytes | memoryview) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps([ids, name_table], ensure_ascii=False).encode("utf-8"))
+    h.update(payload)
+    return h.hexdigest()
+
+
+def write_snapshot(store: DustbinStore, path: Path, source_path: Path | None = None) -> None:
+    """写出快照；先写临时文件再替换，避免其他进程读到写了一半的文件"""
+    arrays = {
+        "lng": np.ascontiguousarray(store.lng, dtype="<f8"),
+        "lat": np.ascontiguousarray(store.lat, dtype="<f8"),
+        "counts": np.ascontiguousarray(store.counts, dtype="<i4"),
+        "name_idx": np.ascontiguousarray(store.name_idx, dtype="<i4"),
+    }
+    layout = {}
+    chunks = []
+    offset = 0
+    for key, arr in arrays.items():
+        data = arr.tobytes()
+        layout[key] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        padding = -len(data) % _ALIGN
+        chunks.append(data + b"\x00" * padding)
+        offset += len(data) + padding
+    payload = b"".join(chunks)
+
+    header = json.dumps(
+        {
+            "format": FORMAT_VERSION,
+            "count": len(store),
+            "ids": store.ids,
+            "name_table": store.name_table,
+            "arrays": layout,
+            "source_sha256": _file_sha256(source_path) if source_path is not None else None,
+            "checksum": _checksum(store.ids, store.name_table, payload),
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    prefix += b"\x00" * (-len(prefix) % _ALIGN)
+
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("wb") as f:
+        f.write(prefix)
+        f.write(payload)
+    os.replace(tmp_path, path)
+    logger.info(f"站点快照已写入: {path}（{len(store)} 个站点，{len(prefix) + len(payload)} 字节）")
+
+
+def load_snapshot(path: Path, source_path: Path | None = None) -> DustbinStore | None:
+    """内存映射加载快照；文件不存在、格式不符、校验失败或数据表已更新时返回 None"""
+    if not path.exists():
+        return None
+    try:
+        mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(mm[: len(MAGIC)]) != MAGIC:
+            logger.warning(f"站点快照格式不符，忽略: {path}")
+            return None
+        (header_len,) = struct.unpack("<I", bytes(mm[len(MAGIC) : len(MAGIC) + 4]))
+        header_start = len(MAGIC) + 4
+        header = json.loads(bytes(mm[header_start : header_start + header_len]).decode("utf-8"))
+        if header.get("format") != FORMAT_VERSION:
+            return None
+
+        if source_path is not None and source_path.exists():
+            if header.get("source_sha256") != _file_sha256(source_path):
+                logger.info(f"站点数据表已更新，快照失效: {path}")
+                return None
+
+        data_start = header_start + header_len
+        data_start += -data_start % _ALIGN
+        payload = mm[data_start:]
+        if _checksum(header["ids"], header["name_table"], memoryview(payload)) != header["checksum"]:
+            logger.warning(f"站点快照校验失败，忽略: {path}")
+            return None
+
+        arrays = {}
+        for key, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            start = spec["offset"]
+            arrays[key] = payload[start : start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    except (OSError, ValueError, KeyError, struct.error) as e:
+        logger.warning(f"读取站点快照失败: {e}")
+        return None
+
+    name_table = header["name_table"]
+    names = [name_table[i] for i in arrays["name_idx"].tolist()]
+    return DustbinStore(header["ids"], names, arrays["lng"], arrays["lat"], arrays["counts"])
+
+
+if __name__ == "__main__":
+    from .loader import load_excel
+
+    if len(sys.argv) not in (2, 3):
+        print("用法: python -m app.snapshot <站点表格.xlsx> [输出快照路径]")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    source = Path(sys.argv[1])
+    target = Path(sys.argv[2]) if len(sys.argv) == 3 else source.with_suffix(".usnap")
+    store = load_excel(source)
+    if not store:
+        print(f"未能从 {source} 解析出任何站点")
+        sys.exit(1)
+    write_snapshot(store, target, source)
@@ -0,0 +1,174 @@
+"""站点空间索引
+
+将经纬度按局部等距投影换算为平面米坐标，再按固定边长划分网格桶。
+查询时从用户所在网格向外逐圈扩展，只计算附近桶内站点的球面距离，
+避免每次请求都对全部站点计算距离并整体排序。
+"""
+import heapq
+from math import radians, sin, cos, sqrt, atan2, floor
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """计算两坐标间球面距离（米）"""
+    dlon = radians(lon2 - lon1)
+    dlat = radians(lat2 - lat1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return EARTH_RADIUS_M * c
+
+
+def haversine_many(lon1: float, lat1: float, lon2: np.ndarray, lat2: np.ndarray) -> np.ndarray:
+    """向量化计算一个坐标到一组坐标的球面距离（米）"""
+    lon1_r, lat1_r = radians(lon1), radians(lat1)
+    lon2_r, lat2_r = np.radians(lon2), np.radians(lat2)
+    a = np.sin((lat2_r - lat1_r) / 2) ** 2 + cos(lat1_r) * np.cos(lat2_r) * np.sin((lon2_r - lon1_r) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+class GridIndex:
+    """基于网格桶的 k 近邻索引（构建一次，只读查询）
+
+    points: [(lng, lat), ...]，查询结果中的下标即 points 中的下标。
+    """
+
+    def __init__(self, points: list[tuple[float, float]], cell_size_m: float = 50.0):
+        self.cell_size_m = cell_size_m
+        self.size = len(points)
+        self._points = list(points)
+        self._lng = np.array([p[0] for p in self._points], dtype=np.float64)
+        self._lat = np.array([p[1] for p in self._points], dtype=np.float64)
+        self._buckets: dict[tuple[int, int], list[int]] = {}
+
+        # 以站点平均纬度作为投影参考纬度，校园尺度下误差可忽略
+        ref_lat = sum(lat for _, lat in points) / len(points) if points else 0.0
+        self._x_scale = EARTH_RADIUS_M * cos(radians(ref_lat)) * radians(1.0) / cell_size_m
+        self._y_scale = EARTH_RADIUS_M * radians(1.0) / cell_size_m
+
+        for idx, (lng, lat) in enumerate(self._points):
+            self._buckets.setdefault(self._cell_of(lng, lat), []).append(idx)
+
+        if self._buckets:
+            xs = [cx for cx, _ in self._buckets]
+            ys = [cy for _, cy in self._buckets]
+            self._bounds = (min(xs), max(xs), min(ys), max(ys))
+        else:
+            self._bounds = None
+
+    def _cell_of(self, lng: float, lat: float) -> tuple[int, int]:
+        return floor(lng * self._x_scale), floor(lat * self._y_scale)
+
+    def _ring(self, cx: int, cy: int, r: int):
+        """按圈返回与站点范围相交的网格坐标"""
+        min_x, max_x, min_y, max_y = self._bounds
+        for x in range(max(cx - r, min_x), min(cx + r, max_x) + 1):
+            if abs(x - cx) == r:
+                ys = range(max(cy - r, min_y), min(cy + r, max_y) + 1)
+            else:
+                ys = [y for y in (cy - r, cy + r) if min_y <= y <= max_y]
+            for y in ys:
+                yield x, y
+
+    def k_nearest(self, lng: float, lat: float, k: int) -> list[tuple[float, int]]:
+        """返回距离最近的 k 个站点 [(球面距离米, 下标), ...]，按距离升序"""
+        if self._bounds is None or k <= 0:
+            return []
+        k = min(k, self.size)
+
+        cx, cy = self._cell_of(lng, lat)
+        min_x, max_x, min_y, max_y = self._bounds
+        # 查询点在站点范围外时，从第一圈可能有站点的位置开始扩展
+        r_start = max(min_x - cx, cx - max_x, min_y - cy, cy - max_y, 0)
+        r_end = max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+
+        # 大顶堆（距离取负），保留当前最优的 k 个
+        best: list[tuple[float, int]] = []
+        scanned = 0
+        for r in range(r_start, r_end + 1):
+            # 站点分布稀疏（如多校区相距很远）时逐圈扫描空桶不划算，直接全量计算
+            scanned += 8 * r or 1
+            if scanned > len(self._buckets):
+                return self._brute_force(lng, lat, k)
+            for cell in self._ring(cx, cy, r):
+                for idx in self._buckets.get(cell, ()):
+                    p_lng, p_lat = self._points[idx]
+                    d = haversine(lng, lat, p_lng, p_lat)
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, idx))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, idx))
+            # 未扫描的网格距查询点至少 r 个网格边长，留 1% 余量抵消投影误差
+            if len(best) == k and -best[0][0] <= r * self.cell_size_m * 0.99:
+                break
+
+        return sorted((-d, idx) for d, idx in best)
+
+    def _brute_force(self, lng: float, lat: float, k: int) -> list[tuple[float, int]]:
+        dist = haversine_many(lng, lat, self._lng, self._lat)
+        idx = np.argpartition(dist, k - 1)[:k] if k < self.size else np.arange(self.size)
+        return sorted(zip(dist[idx].tolist(), idx.tolist()))
+
+
+class CoordIndex:
+    """按经纬度量化取整的哈希索引，用于按坐标精确反查站点
+
+    容差为 tolerance 度，查找时同时检查相邻的量化格，保证与逐个比较
+    abs(差值) < tolerance 的结果一致。
+    """
+
+    def __init__(self, points: list[tuple[float, float]], tolerance: float = 0.0001):
+        self.tolerance = tolerance
+        self._points = list(points)
+        self._cells: dict[tuple[int, int], list[int]] = {}
+        for idx, (lng, lat) in enumerate(self._points):
+            self._cells.setdefault(self._key(lng, lat), []).append(idx)
+
+    def _key(self, lng: float, lat: float) -> tuple[int, int]:
+        return floor(lng / self.tolerance), floor(lat / self.tolerance)
+
+    def find(self, lng: float, lat: float) -> int | None:
+        """返回容差范围内的站点下标，多个命中时取下标最小者"""
+        kx, ky = self._key(lng, lat)
+        found = None
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for idx in self._cells.get((kx + dx, ky + dy), ()):
+                    p_lng, p_lat = self._points[idx]
+                    if abs(p_lng - lng) < self.tolerance and abs(p_lat - lat) < self.tolerance:
+                        if found is None or idx < found:
+                            found = idx
+        return found
+
+
+def nearest_many(
+    origin_lng: np.ndarray,
+    origin_lat: np.ndarray,
+    lng: np.ndarray,
+    lat: np.ndarray,
+    chunk_cells: int = 4_000_000,
+) -> tuple[np.ndarray, np.ndarray]:
+    """对多个起点做向量化 haversine，返回 (最近站点下标数组, 球面距离米数组)
+
+    按块计算 起点数×站点数 的距离矩阵，单块元素数不超过 chunk_cells 以控制内存。
+    """
+    lng_r, lat_r = np.radians(lng), np.radians(lat)
+    cos_lat = np.cos(lat_r)
+    o_lng_r, o_lat_r = np.radians(origin_lng), np.radians(origin_lat)
+
+    best_idx = np.empty(len(origin_lng), dtype=np.int64)
+    best_dist = np.empty(len(origin_lng), dtype=np.float64)
+    step = max(1, chunk_cells // max(len(lng), 1))
+    for start in range(0, len(origin_lng), step):
+        sl = slice(start, start + step)
+        o_lng = o_lng_r[sl, None]
+        o_lat = o_lat_r[sl, None]
+        a = np.sin((lat_r - o_lat) / 2) ** 2 + np.cos(o_lat) * cos_lat * np.sin((lng_r - o_lng) / 2) ** 2
+        # 最小距离对应最小的 a，先取下标再只对选中的元素求距离
+        idx = np.argmin(a, axis=1)
+        a_min = a[np.arange(len(idx)), idx]
+        best_idx[sl] = idx
+        best_dist[sl] = 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a_min), np.sqrt(1 - a_min))
+    return best_idx, best_dist
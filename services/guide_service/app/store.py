@@ -0,0 +1,104 @@
+"""列式站点存储
+
+站点坐标、各类垃圾桶数量保存在 NumPy 数组中，站点名称放在一张去重的名称表里，
+按下标引用。接口需要单个站点时再按需组装成 dict。
+"""
+import sys
+from functools import lru_cache
+
+import numpy as np
+
+# 顺序与原 bin_types 字典的键顺序一致
+BIN_CATEGORIES = ("其他", "可回收", "厨余", "有害")
+
+
+def normalize_category(category: str) -> str | None:
+    """把 "有害垃圾"、"可回收物" 等分类名称归一到 BIN_CATEGORIES 中的名称，无法识别时返回 None"""
+    category = category.strip()
+    for suffix in ("垃圾", "物"):
+        if category.endswith(suffix) and category[: -len(suffix)] in BIN_CATEGORIES:
+            return category[: -len(suffix)]
+    return category if category in BIN_CATEGORIES else None
+
+
+@lru_cache(maxsize=None)
+def build_bin_description(counts: tuple[int, ...]) -> str:
+    """根据各类垃圾桶数量（按 BIN_CATEGORIES 顺序）生成描述（B风格：说明式）"""
+    present = {cat for cat, count in zip(BIN_CATEGORIES, counts) if count and count > 0}
+    categories = [cat for cat in ["可回收", "厨余", "有害", "其他"] if cat in present]
+
+    if not categories:
+        return "无分类垃圾桶"
+
+    if len(categories) >= 4:
+        return "配有可回收、厨余、有害、其他垃圾桶"
+
+    return "配有" + "、".join(categories) + "垃圾桶"
+
+
+class DustbinStore:
+    def __init__(
+        self,
+        ids: list[str],
+        names: list[str],
+        lng: np.ndarray,
+        lat: np.ndarray,
+        counts: np.ndarray,
+    ):
+        self.ids = [sys.intern(i) for i in ids]
+        # 名称表：重复的站点名称只存一份
+        table: dict[str, int] = {}
+        self.name_table: list[str] = []
+        name_idx = np.empty(len(names), dtype=np.int32)
+        for i, name in enumerate(names):
+            if name not in table:
+                table[name] = len(self.name_table)
+                self.name_table.append(sys.intern(name))
+            name_idx[i] = table[name]
+        self.name_idx = name_idx
+
+        self.lng = np.ascontiguousarray(lng, dtype=np.float64)
+        self.lat = np.ascontiguousarray(lat, dtype=np.float64)
+        self.counts = np.ascontiguousarray(counts, dtype=np.int32).reshape(len(ids), len(BIN_CATEGORIES))
+        self.pos = {dustbin_id: i for i, dustbin_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def name(self, i: int) -> str:
+        return self.name_table[self.name_idx[i]]
+
+    def points(self) -> list[tuple[float, float]]:
+        return list(zip(self.lng.tolist(), self.lat.tolist()))
+
+    def row(self, i: int) -> dict:
+        """组装单个站点的接口数据"""
+        counts = tuple(self.counts[i].tolist())
+        return {
+            "id": self.ids[i],
+            "name": self.name(i),
+            "lng": float(self.lng[i]),
+            "lat": float(self.lat[i]),
+            "bin_types": dict(zip(BIN_CATEGORIES, counts)),
+            "description": build_bin_description(counts),
+        }
+
+    def get(self, dustbin_id: str) -> dict | None:
+        i = self.pos.get(dustbin_id)
+        return None if i is None else self.row(i)
+
+    def records(self) -> list[dict]:
+        """按列批量组装全部站点数据"""
+        names = [self.name_table[i] for i in self.name_idx.tolist()]
+        counts = [tuple(c) for c in self.counts.tolist()]
+        return [
+            {
+                "id": dustbin_id,
+                "name": name,
+                "lng": lng,
+                "lat": lat,
+                "bin_types": dict(zip(BIN_CATEGORIES, c)),
+                "description": build_bin_description(c),
+            }
+            for dustbin_id, name, lng, lat, c in zip(self.ids, names, self.lng.tolist(), self.lat.tolist(), counts)
+        ]
@@ -0,0 +1,202 @@
+"""校园步行路网
+
+从 CSV 边表或 OSM 导出文件一次性导入步行路网，为每个站点预先计算到所有路网
+节点的最短步行距离（Dijkstra）。之后 /nearest、/route 只需把用户位置吸附到最近
+的路网节点并查表，即可在不调用高德的情况下给出步行距离和耗时。
+
+CSV 边表格式（表头必需）::
+
+    from_lng,from_lat,to_lng,to_lat[,length]
+
+length 为米，缺省时按两端点球面距离计算；边按双向处理。
+"""
+import csv
+import heapq
+import logging
+import xml.etree.ElementTree as ET
+from math import isinf
+from pathlib import Path
+
+import numpy as np
+
+from .spatial import GridIndex, haversine
+
+logger = logging.getLogger("uvicorn.error")
+
+# OSM 中可步行的道路类型
+_WALKABLE_HIGHWAYS = {
+    "footway", "path", "pedestrian", "steps", "corridor", "living_street", "residential",
+    "service", "track", "unclassified", "tertiary", "secondary", "primary", "cycleway",
+}
+
+
+class WalkGraph:
+    def __init__(self, nodes: list[tuple[float, float]], edges: list[tuple[int, int, float]]):
+        self.nodes = nodes
+        self.adjacency: list[list[tuple[int, float]]] = [[] for _ in nodes]
+        for u, v, length in edges:
+            self.adjacency[u].append((v, length))
+            self.adjacency[v].append((u, length))
+        self.edge_count = len(edges)
+        self._node_index = GridIndex(nodes)
+        # 路网节点 → 该节点出发的最短距离表；站点数据重新加载时，吸附节点未变的站点直接复用
+        self._distance_cache: dict[int, np.ndarray] = {}
+
+    def snap(self, lng: float, lat: float) -> tuple[float, int] | None:
+        """返回 (到最近路网节点的直线距离, 节点下标)"""
+        nearest = self._node_index.k_nearest(lng, lat, 1)
+        return nearest[0] if nearest else None
+
+    def shortest_from(self, source: int) -> list[float]:
+        """单源 Dijkstra，返回到每个节点的最短距离（不可达为 inf）"""
+        dist = [float("inf")] * len(self.nodes)
+        dist[source] = 0.0
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, length in self.adjacency[u]:
+                nd = d + length
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v))
+        return dist
+
+    def distances_from(self, source: int) -> np.ndarray:
+        """source 节点到每个节点的最短距离（float32，不可达为 inf），结果按节点缓存"""
+        dist = self._distance_cache.get(source)
+        if dist is None:
+            dist = np.asarray(self.shortest_from(source), dtype=np.float32)
+            self._distance_cache[source] = dist
+        return dist
+
+    def station_distances(self, stations: list[tuple[float, float]], max_snap_m: float) -> "StationDistances":
+        cached = len(self._distance_cache)
+        result = StationDistances(self, stations, max_snap_m)
+        used = result.source_nodes()
+        # 只保留本次站点用到的节点，旧版本站点数据仍持有各自数组的引用，不受影响
+        self._distance_cache = {node: self._distance_cache[node] for node in used}
+        logger.info(f"WALK_GRAPH_DISTANCES sources={len(used)} cached_before={cached}")
+        return result
+
+
+class StationDistances:
+    """每个站点到全部路网节点的预计算最短步行距离"""
+
+    def __init__(self, graph: WalkGraph, stations: list[tuple[float, float]], max_snap_m: float):
+        self.graph = graph
+        self.stations = stations
+        self.max_snap_m = max_snap_m
+        # 站点吸附到的节点及吸附距离；离路网过远的站点视为不可达
+        self._station_snap: list[tuple[float, int] | None] = []
+        self._dist: list[np.ndarray | None] = []
+        for lng, lat in stations:
+            snapped = graph.snap(lng, lat)
+            if snapped is None or snapped[0] > max_snap_m:
+                self._station_snap.append(None)
+                self._dist.append(None)
+                continue
+            self._station_snap.append(snapped)
+            self._dist.append(graph.distances_from(snapped[1]))
+
+    def source_nodes(self) -> set[int]:
+        return {snap[1] for snap in self._station_snap if snap is not None}
+
+    def distance_to(self, lng: float, lat: float, station_idx: int) -> float | None:
+        """用户位置到指定站点的步行距离（米），用户或站点不在路网附近时返回 None"""
+        origin = self.graph.snap(lng, lat)
+        if origin is None or origin[0] > self.max_snap_m:
+            return None
+        return self._distance_from_snap(lng, lat, origin, station_idx)
+
+    def distances_to(self, lng: float, lat: float, station_indices: list[int]) -> list[float | None]:
+        origin = self.graph.snap(lng, lat)
+        if origin is None or origin[0] > self.max_snap_m:
+            return [None] * len(station_indices)
+        return [self._distance_from_snap(lng, lat, origin, idx) for idx in station_indices]
+
+    def _distance_from_snap(self, lng: float, lat: float, origin: tuple[float, int], station_idx: int) -> float | None:
+        dist = self._dist[station_idx]
+        if dist is None:
+            return None
+        origin_snap_m, node = origin
+        on_graph = float(dist[node])
+        if isinf(on_graph):
+            return None
+        station_snap_m = self._station_snap[station_idx][0]
+        total = origin_snap_m + on_graph + station_snap_m
+        # 吸附误差可能使结果小于直线距离，步行距离不应短于直线距离
+        s_lng, s_lat = self.stations[station_idx]
+        return max(total, haversine(lng, lat, s_lng, s_lat))
+
+
+def _load_csv(path: Path) -> tuple[list[tuple[float, float]], list[tuple[int, int, float]]]:
+    nodes: list[tuple[float, float]] = []
+    node_ids: dict[tuple[float, float], int] = {}
+    edges: list[tuple[int, int, float]] = []
+
+    def node_of(lng: float, lat: float) -> int:
+        key = (round(lng, 6), round(lat, 6))
+        if key not in node_ids:
+            node_ids[key] = len(nodes)
+            nodes.append(key)
+        return node_ids[key]
+
+    with path.open(newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            a = (float(row["from_lng"]), float(row["from_lat"]))
+            b = (float(row["to_lng"]), float(row["to_lat"]))
+            length = float(row["length"]) if row.get("length") else haversine(*a, *b)
+            edges.append((node_of(*a), node_of(*b), length))
+    return nodes, edges
+
+
+def _load_osm(path: Path) -> tuple[list[tuple[float, float]], list[tuple[int, int, float]]]:
+    osm_nodes: dict[str, tuple[float, float]] = {}
+    ways: list[list[str]] = []
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "node":
+            osm_nodes[elem.get("id")] = (float(elem.get("lon")), float(elem.get("lat")))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+            if tags.get("highway") in _WALKABLE_HIGHWAYS and tags.get("foot") != "no":
+                ways.append([nd.get("ref") for nd in elem.findall("nd")])
+            elem.clear()
+
+    nodes: list[tuple[float, float]] = []
+    node_ids: dict[str, int] = {}
+    edges: list[tuple[int, int, float]] = []
+
+    def node_of(ref: str) -> int:
+        if ref not in node_ids:
+            node_ids[ref] = len(nodes)
+            nodes.append(osm_nodes[ref])
+        return node_ids[ref]
+
+    for refs in ways:
+        refs = [ref for ref in refs if ref in osm_nodes]
+        for a, b in zip(refs, refs[1:]):
+            edges.append((node_of(a), node_of(b), haversine(*osm_nodes[a], *osm_nodes[b])))
+    return nodes, edges
+
+
+def load_walk_graph(path: Path) -> WalkGraph | None:
+    """按扩展名导入 .csv 边表或 .osm 路网文件，失败时返回 None"""
+    if not path.exists():
+        logger.warning(f"步行路网文件不存在: {path}")
+        return None
+    try:
+        if path.suffix.lower() == ".osm":
+            nodes, edges = _load_osm(path)
+        else:
+            nodes, edges = _load_csv(path)
+    except Exception as e:
+        logger.error(f"读取步行路网失败: {e}")
+        return None
+    if not edges:
+        logger.warning(f"步行路网为空: {path}")
+        return None
+    logger.info(f"步行路网加载完成: {len(nodes)} 个节点，{len(edges)} 条边")
+    return WalkGraph(nodes, edges)
@@ -0,0 +1,132 @@
+"""音频转码
+
+上传的 webm/ogg/mp3 等音频边读边写入 ffmpeg 的标准输入，同时从标准输出读取
+16kHz、单声道、16 位小端 PCM（百度 ASR 的 pcm 格式），全程不落盘，也不需要先把
+整个上传文件读入内存。ffmpeg 进程数由 TranscodePool 限制，排队过长时直接拒绝新任务。
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+# 百度 ASR 要求的采样率
+TARGET_RATE = 16000
+
+_FFMPEG_ARGS = [
+    "ffmpeg", "-hide_banner", "-loglevel", "error",
+    "-i", "pipe:0",
+    "-ac", "1", "-ar", str(TARGET_RATE), "-f", "s16le", "-acodec", "pcm_s16le",
+    "pipe:1",
+]
+
+
+class TranscodeError(Exception):
+    """音频无法解码或 ffmpeg 执行失败"""
+
+
+class TranscodeBusy(Exception):
+    """转码池排队已满"""
+
+
+async def transcode_stream(chunks: AsyncIterator[bytes], timeout: float = 30.0) -> bytes:
+    """把分块输入的音频转为 16kHz 单声道 s16le PCM
+
+    chunks 中抛出的异常（如超出大小限制）会终止 ffmpeg 并原样向上抛出。
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *_FFMPEG_ARGS,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+    except FileNotFoundError:
+        raise TranscodeError("未找到 ffmpeg")
+
+    async def _feed() -> None:
+        try:
+            async for chunk in chunks:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg 提前退出，错误信息由退出码和 stderr 给出
+        finally:
+            proc.stdin.close()
+
+    try:
+        _, pcm, stderr = await asyncio.wait_for(
+            asyncio.gather(_feed(), proc.stdout.read(), proc.stderr.read()), timeout
+        )
+        await proc.wait()
+    except asyncio.TimeoutError:
+        raise TranscodeError(f"转码超时（{timeout}s）")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+    if proc.returncode != 0:
+        message = stderr.decode(errors="ignore").strip().splitlines()
+        raise TranscodeError(message[-1] if message else f"ffmpeg 退出码 {proc.returncode}")
+    if not pcm:
+        raise TranscodeError("音频中没有可识别的声音数据")
+    return pcm
+
+
+class TranscodePool:
+    """限制同时运行的转码任务：最多 workers 个任务执行，另有最多 max_queue 个任务排队，
+    超出时 slot() 立即抛出 TranscodeBusy，由调用方返回 503，而不是让排队时间无限增长。"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(workers)
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.max_pending = 0
+        self._total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def queued(self) -> int:
+        return max(0, self.pending - self.workers)
+
+    @asynccontextmanager
+    async def slot(self):
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise TranscodeBusy(f"转码排队已满（{self.pending} 个任务）")
+
+        submitted = time.monotonic()
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        try:
+            async with self._slots:
+                wait = time.monotonic() - submitted
+                self._total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                try:
+                    yield
+                except Exception:
+                    self.failed += 1
+                    raise
+                self.completed += 1
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": min(self.pending, self.workers),
+            "queued": self.queued,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self._total_wait / finished * 1000, 1) if finished else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
@@ -0,0 +1,150 @@
+"""百度 OAuth access_token 管理
+
+- 同一时刻只有一个刷新请求（asyncio.Lock），等待锁的调用者直接复用刷新结果
+- 后台任务在到期前 refresh_margin 秒主动刷新，请求路径上一般直接拿到有效 token
+- token 已进入刷新窗口但仍有效时照常返回，同时在后台触发刷新
+- 获取失败时按指数退避 + 随机抖动重试，避免多个实例同时重试
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Callable
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# 距到期不足该秒数的 token 视为已失效，必须同步刷新
+_EXPIRY_SAFETY_S = 60.0
+
+
+class TokenError(Exception):
+    """获取 access_token 失败"""
+
+
+class TokenProvider:
+    def __init__(
+        self,
+        name: str,
+        token_url: str,
+        client_id: str | None,
+        client_secret: str | None,
+        http_client: Callable[[], httpx.AsyncClient],
+        timeout: float = 10.0,
+        refresh_margin: float = 3600.0,
+        retries: int = 3,
+        retry_base_delay: float = 0.5,
+    ):
+        self.name = name
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self._http_client = http_client
+        self.timeout = timeout
+        self.refresh_margin = refresh_margin
+        self.retries = retries
+        self.retry_base_delay = retry_base_delay
+        self._token: str | None = None
+        self._expire_at = 0.0
+        self._lifetime = 0.0
+        self._lock = asyncio.Lock()
+        self._background: asyncio.Task | None = None
+        self._refreshed = asyncio.Event()
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error: str | None = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    def _margin(self) -> float:
+        # 有效期较短的 token 最多提前一半有效期刷新
+        return min(self.refresh_margin, self._lifetime / 2)
+
+    def _valid_for(self, margin: float) -> bool:
+        return self._token is not None and time.time() < self._expire_at - margin
+
+    async def get(self) -> str:
+        if self._valid_for(_EXPIRY_SAFETY_S):
+            if not self._valid_for(self._margin()):
+                self._refresh_in_background()
+            return self._token
+        return await self.refresh()
+
+    async def refresh(self) -> str:
+        """刷新 token；并发调用只会发出一次请求，刷新窗口外的有效 token 直接返回"""
+        async with self._lock:
+            if self._valid_for(self._margin()):
+                return self._token
+            return await self._fetch_with_retry()
+
+    def _refresh_in_background(self) -> None:
+        if self._background is None or self._background.done():
+            self._background = asyncio.create_task(self._refresh_quietly())
+
+    async def _refresh_quietly(self) -> None:
+        try:
+            await self.refresh()
+        except TokenError as e:
+            logger.warning(f"TOKEN_BACKGROUND_REFRESH_FAILED name={self.name} error={e}")
+
+    async def _fetch_with_retry(self) -> str:
+        params = {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+        for attempt in range(self.retries):
+            try:
+                resp = await self._http_client().post(self.token_url, params=params, timeout=self.timeout)
+                resp.raise_for_status()
+                data = resp.json()
+                if "access_token" not in data:
+                    raise TokenError(f"获取token失败: {data}")
+            except Exception as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                if attempt == self.retries - 1:
+                    raise TokenError(f"获取{self.name} token失败: {e}") from e
+                # 指数退避 + 全抖动
+                await asyncio.sleep(random.uniform(0, self.retry_base_delay * 2**attempt))
+                continue
+
+            self._lifetime = float(data.get("expires_in", 0))
+            self._token = data["access_token"]
+            self._expire_at = time.time() + self._lifetime
+            self.refreshes += 1
+            self.last_error = None
+            self._refreshed.set()
+            logger.info(f"TOKEN_REFRESHED name={self.name} expires_in={int(self._lifetime)}s")
+            return self._token
+        raise TokenError(f"获取{self.name} token失败")
+
+    async def keep_fresh(self, retry_min: float = 5.0, retry_max: float = 30.0) -> None:
+        """后台任务：启动时先获取一次，之后在进入刷新窗口时刷新，失败时随机等待后重试。
+        token 被其他调用者刷新后按新的到期时间重新计时。"""
+        while True:
+            try:
+                await self.refresh()
+                delay = max(self._expire_at - self._margin() - time.time(), 1.0)
+            except TokenError as e:
+                logger.warning(f"TOKEN_REFRESH_FAILED name={self.name} error={e}")
+                delay = random.uniform(retry_min, retry_max)
+            self._refreshed.clear()
+            try:
+                await asyncio.wait_for(self._refreshed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self.name,
+            "configured": self.configured,
+            "has_token": self._token is not None,
+            "expires_in": max(0, int(self._expire_at - time.time())) if self._token else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
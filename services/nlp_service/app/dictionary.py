@@ -0,0 +1,210 @@
+"""垃圾物品词典
+
+词典由 物品名 → 类别、同义词 → 物品名 以及各类别的通用关键词组成，可从多个 JSON 文件合并加载：
+
+- 结构化格式: {"items": {物品: 类别}, "synonyms": {同义词: 物品}, "keywords": {类别: [关键词]}}
+- garbage_dict.json 格式: {"0": "类别/物品", ...}
+
+查询依次尝试：
+
+1. 整句与物品名/同义词精确匹配，score=1.0；安装 pypinyin 时也可用拼音查询（0.9），
+   或按读音匹配同音错字（如 电吃 → 电池，0.85），这是语音识别和输入法最常见的错误
+2. 关键词自动机在文本中找出最长的物品名/同义词/关键词，score 随命中部分占文本的比例升高；
+   短于 min_keyword_len 的物品名/同义词（如 包、锅）只参与精确匹配，避免 包子、锅巴 这类误判
+3. n-gram 索引（汉字用二元组，拼音用三元组）召回相近的词条，按编辑距离打分，容忍错别字、漏字和拼音拼错；
+   短于 min_keyword_len 的词条不参与模糊匹配
+"""
+import json
+import logging
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from .matcher import KeywordMatcher
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:  # pypinyin 为可选依赖，未安装时不支持拼音查询
+    lazy_pinyin = None
+
+logger = logging.getLogger(__name__)
+
+# 默认类别顺序，也是关键词长度相同时的优先顺序
+CATEGORIES = ("可回收物", "厨余垃圾", "有害垃圾", "其他垃圾")
+
+_NOISE_RE = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """全角转半角、转小写并去掉空白和标点"""
+    return _NOISE_RE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def _to_pinyin(text: str) -> str | None:
+    if lazy_pinyin is None or text.isascii():
+        return None
+    return "".join(lazy_pinyin(text))
+
+
+def _grams(text: str) -> set[str]:
+    # 物品名多为 2~3 个汉字，三元组下错一个字就没有共同的 gram，因此汉字用二元组
+    n = 3 if text.isascii() else 2
+    padded = f"^{text}$"
+    return {padded[i : i + n] for i in range(len(padded) - n + 1)}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+class GarbageDictionary:
+    def __init__(
+        self,
+        items: dict[str, str],
+        synonyms: dict[str, str] | None = None,
+        keywords: dict[str, list[str]] | None = None,
+        categories: list[str] | None = None,
+        fuzzy_min_score: float = 0.5,
+        fuzzy_max_len: int = 16,
+        min_keyword_len: int = 2,
+    ):
+        self.fuzzy_min_score = fuzzy_min_score
+        self.fuzzy_max_len = fuzzy_max_len
+        self.min_keyword_len = min_keyword_len
+        order = list(categories or CATEGORIES)
+        for category in list(items.values()) + list(keywords or {}):
+            if category not in order:
+                order.append(category)
+        self.categories = order
+        self.item_count = len(items)
+
+        # 规范化后的词条 → (物品名, 类别)
+        self._entries: dict[str, tuple[str, str]] = {}
+        for item, category in items.items():
+            self._add(item, item, category)
+        for alias, item in (synonyms or {}).items():
+            category = items.get(item)
+            if category is None:
+                logger.warning(f"同义词 {alias} 指向不存在的物品 {item}，已忽略")
+                continue
+            self._add(alias, item, category)
+        explicit: set[str] = set()
+        for category, words in (keywords or {}).items():
+            for word in words:
+                self._add(word, word, category)
+                explicit.add(normalize(word))
+
+        # 显式配置的关键词不限长度，物品名/同义词过短时作为子串误判太多
+        rules: dict[str, list[str]] = {category: [] for category in self.categories}
+        for surface, (_, category) in self._entries.items():
+            if len(surface) >= min_keyword_len or surface in explicit:
+                rules[category].append(surface)
+        self._matcher = KeywordMatcher(rules)
+
+        # 拼音 → (物品名, 类别)，拼音相同时保留先出现的词条
+        self._pinyin: dict[str, tuple[str, str]] = {}
+        for surface, entry in self._entries.items():
+            pinyin = _to_pinyin(surface)
+            if pinyin:
+                self._pinyin.setdefault(pinyin, entry)
+
+        # 单字词条与只差一个字的两字文本（包 / 包子）编辑距离得分就能达到阈值，不参与模糊匹配
+        fuzzy_entries = [surface for surface in self._entries if len(surface) >= min_keyword_len]
+        self._surfaces = fuzzy_entries + list(dict.fromkeys(filter(None, map(_to_pinyin, fuzzy_entries))))
+        self._postings: dict[str, list[int]] = defaultdict(list)
+        for i, surface in enumerate(self._surfaces):
+            for gram in _grams(surface):
+                self._postings[gram].append(i)
+
+    def _add(self, surface: str, item: str, category: str) -> None:
+        key = normalize(surface)
+        if key and key not in self._entries:
+            self._entries[key] = (item, category)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, text: str) -> dict | None:
+        """返回 {"item", "category", "score", "match"}，无法匹配时返回 None"""
+        query = normalize(text)
+        if not query:
+            return None
+
+        entry = self._entries.get(query)
+        if entry is not None:
+            return self._result(entry, 1.0, "exact")
+        if query.isascii():
+            if query in self._pinyin:
+                return self._result(self._pinyin[query], 0.9, "pinyin")
+        else:
+            entry = self._pinyin.get(_to_pinyin(query) or "")
+            if entry is not None:
+                return self._result(entry, 0.85, "homophone")
+
+        hit = self._matcher.find(query)
+        if hit is not None:
+            keyword = hit[0]
+            return self._result(self._entries[keyword], 0.5 + 0.5 * len(keyword) / len(query), "keyword")
+
+        if len(query) <= self.fuzzy_max_len:
+            return self._fuzzy(query)
+        return None
+
+    def _fuzzy(self, query: str) -> dict | None:
+        shared = Counter()
+        for gram in _grams(query):
+            for i in self._postings.get(gram, ()):
+                shared[i] += 1
+        best = None
+        for i, _ in shared.most_common(32):
+            surface = self._surfaces[i]
+            length = max(len(query), len(surface))
+            distance = _edit_distance(query, surface)
+            # 汉字文本至少要有两个字对得上，只差一个字的两字词（包子 / 鞋子）多半是不同的物品，
+            # 同音错字已由读音匹配处理
+            if not query.isascii() and length - distance < 2:
+                continue
+            score = 1 - distance / length
+            if best is None or score > best[0]:
+                best = (score, surface)
+        if best is None or best[0] < self.fuzzy_min_score:
+            return None
+        score, surface = best
+        entry = self._entries.get(surface) or self._pinyin[surface]
+        return self._result(entry, score * 0.9, "fuzzy")
+
+    @staticmethod
+    def _result(entry: tuple[str, str], score: float, match: str) -> dict:
+        return {"item": entry[0], "category": entry[1], "score": round(score, 3), "match": match}
+
+
+def load_dictionary(paths: list[Path], **kwargs) -> GarbageDictionary:
+    """按顺序加载并合并多个词典文件，后加载的物品类别覆盖先加载的"""
+    items: dict[str, str] = {}
+    synonyms: dict[str, str] = {}
+    keywords: dict[str, list[str]] = defaultdict(list)
+    categories: list[str] | None = None
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if "items" in data:
+            items.update(data["items"])
+            synonyms.update(data.get("synonyms", {}))
+            for category, words in data.get("keywords", {}).items():
+                keywords[category].extend(words)
+            categories = categories or data.get("categories")
+        else:
+            # garbage_dict.json: {"0": "类别/物品"}
+            for label in data.values():
+                category, _, item = label.partition("/")
+                if item:
+                    items[item] = category
+        logger.info(f"已加载垃圾词典: {path}")
+    return GarbageDictionary(items, synonyms, dict(keywords), categories, **kwargs)
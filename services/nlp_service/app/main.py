@@ -1,18 +1,17 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.responses import JSONResponse
 
 import httpx
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 import os
-import time
-import base64
 import asyncio
-import requests
+import hashlib
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-import tempfile
 import logging
-from pydub import AudioSegment
+
+from .auth import TokenError, TokenProvider
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -26,131 +25,210 @@ TOKEN_URL = "https://aip.baidubce.com/oauth/2.0/token"
 # 使用标准 REST 接口，比 pro_api 权限要求低，避免 3302 无权限错误
 ASR_URL = "http://vop.baidu.com/server_api"
 
-app = FastAPI(title="NLP Service", description="语音识别 & 文本分类（Mock）", version="0.1.0")
+# ---------------- 出站 HTTP 连接池 --------------------
+# 整个应用生命周期共用一个 AsyncClient，复用到百度鉴权 / ASR 接口的 keep-alive 连接，
+# 不再为每次调用占用一个默认线程池线程并新建连接
+_HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("BAIDU_MAX_CONNECTIONS", "50")),
+    max_keepalive_connections=int(os.getenv("BAIDU_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("BAIDU_KEEPALIVE_EXPIRY", "30")),
+)
+TOKEN_TIMEOUT = float(os.getenv("BAIDU_TOKEN_TIMEOUT", "10"))
+ASR_TIMEOUT = float(os.getenv("ASR_TIMEOUT", "15"))
+# 同时进行中的 ASR 调用上限，超出的请求排队等待，避免突发语音请求压垮上游
+ASR_CONCURRENCY = int(os.getenv("ASR_CONCURRENCY", "16"))
+_ASR_SEMAPHORE = asyncio.Semaphore(ASR_CONCURRENCY)
+_http: httpx.AsyncClient | None = None
+
+
+def _http_client() -> httpx.AsyncClient:
+    if _http is None:
+        raise RuntimeError("HTTP 客户端未初始化，应用 lifespan 尚未启动")
+    return _http
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _http
+    _http = httpx.AsyncClient(timeout=httpx.Timeout(ASR_TIMEOUT, connect=3.0), limits=_HTTP_LIMITS)
+    providers = {id(p): p for p in (_BAIDU_TOKEN, _QIANFAN_TOKEN) if p.configured}
+    refreshers = [asyncio.create_task(p.keep_fresh()) for p in providers.values()]
+    try:
+        yield
+    finally:
+        for refresher in refreshers:
+            refresher.cancel()
+        await _http.aclose()
+        _http = None
+
+
+app = FastAPI(title="NLP Service", description="语音识别 & 文本分类（Mock）", version="0.1.0", lifespan=lifespan)
+
+# 百度语音 access_token：后台任务在到期前 BAIDU_TOKEN_REFRESH_MARGIN 秒刷新，并发刷新合并为一次请求
+_BAIDU_TOKEN = TokenProvider(
+    "baidu_asr",
+    TOKEN_URL,
+    BAIDU_API_KEY,
+    BAIDU_SECRET_KEY,
+    _http_client,
+    timeout=TOKEN_TIMEOUT,
+    refresh_margin=float(os.getenv("BAIDU_TOKEN_REFRESH_MARGIN", "3600")),
+)
+
+
+# 千帆大模型的 access_token 与语音共用同一套获取/刷新逻辑和连接池；凭证相同时直接共用一个实例
+QIANFAN_AK = os.getenv("QIANFAN_AK")
+QIANFAN_SK = os.getenv("QIANFAN_SK")
+CHAT_TIMEOUT = float(os.getenv("QIANFAN_CHAT_TIMEOUT", "20"))
+if (QIANFAN_AK, QIANFAN_SK) == (BAIDU_API_KEY, BAIDU_SECRET_KEY):
+    _QIANFAN_TOKEN = _BAIDU_TOKEN
+else:
+    _QIANFAN_TOKEN = TokenProvider(
+        "qianfan",
+        TOKEN_URL,
+        QIANFAN_AK,
+        QIANFAN_SK,
+        _http_client,
+        timeout=TOKEN_TIMEOUT,
+        refresh_margin=float(os.getenv("BAIDU_TOKEN_REFRESH_MARGIN", "3600")),
+    )
 
-auth_cache = {"token": None, "expire_at": 0.0}
 
 async def get_baidu_token() -> str:
     """获取或复用百度 access_token"""
-    if not BAIDU_API_KEY or not BAIDU_SECRET_KEY:
+    if not _BAIDU_TOKEN.configured:
         raise HTTPException(status_code=500, detail="百度语音 API Key 未配置")
-    # 提前 60 秒刷新
-    if auth_cache["token"] and time.time() < auth_cache["expire_at"] - 60:
-        return auth_cache["token"]
-
-    def _request_token():
-        params = {
-            "grant_type": "client_credentials",
-            "client_id": BAIDU_API_KEY,
-            "client_secret": BAIDU_SECRET_KEY,
-        }
-        resp = requests.post(TOKEN_URL, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        if "access_token" not in data:
-            raise RuntimeError(f"获取百度token失败: {data}")
-        return data
-
     try:
-        data = await asyncio.to_thread(_request_token)
-    except Exception as e:
+        return await _BAIDU_TOKEN.get()
+    except TokenError as e:
         raise HTTPException(status_code=502, detail=str(e))
 
-    auth_cache["token"] = data["access_token"]
-    auth_cache["expire_at"] = time.time() + int(data.get("expires_in", 0))
-    return auth_cache["token"]
-
 class TextInput(BaseModel):
     text: str
 
-# ------- 垃圾分类（示例规则） --------------------------------------------------
-# 真实项目可替换为数据库 / 模型查询，这里用简单关键词映射和模糊匹配演示
-_CATEGORY_RULES = {
-    "可回收物": ["瓶", "易拉罐", "塑料", "玻璃", "纸", "金属"],
-    "厨余垃圾": ["剩饭", "菜叶", "果皮", "蛋壳", "茶叶"],
-    "有害垃圾": ["电池", "灯管", "油漆", "药品"],
-    "其他垃圾": [],  # 兜底
-}
+# ------- 垃圾分类（物品词典） --------------------------------------------------
+# 启动时加载内置词典 data/garbage_items.json 以及 GARBAGE_DICT_PATHS 中的额外词典（用系统路径分隔符分隔），
+# 精确匹配 → 关键词自动机 → 模糊匹配，均在本地完成，不调用大模型
+from pathlib import Path
+
+from .cache import LRUCache
+from .dictionary import GarbageDictionary, load_dictionary, normalize
+
+DEFAULT_CATEGORY = "其他垃圾"
+_BUILTIN_DICT_PATH = Path(__file__).resolve().parent.parent / "data" / "garbage_items.json"
+GARBAGE_DICT_PATHS = [Path(p) for p in os.getenv("GARBAGE_DICT_PATHS", "").split(os.pathsep) if p]
+FUZZY_MIN_SCORE = float(os.getenv("FUZZY_MIN_SCORE", "0.5"))
+NLP_ADMIN_TOKEN = os.getenv("NLP_ADMIN_TOKEN")
+# 分类结果按规范化后的文本缓存，"电池"、" 电池。" 等写法共用一条；词典重新加载时清空
+_TEXT_CACHE = LRUCache(maxsize=int(os.getenv("TEXT_CACHE_SIZE", "10000")))
+
+
+def _load_dictionary() -> GarbageDictionary:
+    paths = [_BUILTIN_DICT_PATH] + GARBAGE_DICT_PATHS
+    return load_dictionary([p for p in paths if p.exists()], fuzzy_min_score=FUZZY_MIN_SCORE)
+
+
+_DICTIONARY = _load_dictionary()
+logger.info(f"垃圾词典加载完成: {_DICTIONARY.item_count} 个物品，{len(_DICTIONARY)} 个词条")
+
+
+def lookup_text(text: str) -> dict:
+    """返回 {"item", "category", "score", "match"}；无法匹配时归为其他垃圾，item 为 None"""
+    key = normalize(text)
+    result = _TEXT_CACHE.get(key)
+    if result is None:
+        result = _DICTIONARY.lookup(key)
+        if result is None:
+            result = {"item": None, "category": DEFAULT_CATEGORY, "score": 0.0, "match": None}
+        _TEXT_CACHE.set(key, result)
+    return result
+
 
 def classify_text(text: str) -> str:
-    """根据关键词做简单垃圾分类，返回类别字符串"""
-    text = text.strip().lower()
-    for category, keywords in _CATEGORY_RULES.items():
-        for kw in keywords:
-            if kw in text:
-                return category
-    return "其他垃圾"
-
-def convert_audio_to_wav(audio_bytes: bytes, source_format: str) -> tuple[bytes, int]:
+    """根据物品词典做垃圾分类，返回类别字符串"""
+    return lookup_text(text)["category"]
+
+# ---------------- 音频转码 --------------------
+# 上传文件按块读取并直接送入 ffmpeg，超过 MAX_AUDIO_BYTES 立即中止（413）；
+# 同时运行的转码进程最多 TRANSCODE_WORKERS 个，排队超过 TRANSCODE_QUEUE_MAX 时直接返回 503
+from typing import AsyncIterator
+
+from .audio import TARGET_RATE, TranscodeBusy, TranscodeError, TranscodePool, transcode_stream
+
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+TRANSCODE_WORKERS = int(os.getenv("TRANSCODE_WORKERS", str(min(4, os.cpu_count() or 1))))
+TRANSCODE_QUEUE_MAX = int(os.getenv("TRANSCODE_QUEUE_MAX", str(TRANSCODE_WORKERS * 2)))
+TRANSCODE_TIMEOUT = float(os.getenv("TRANSCODE_TIMEOUT", "30"))
+_TRANSCODE_POOL = TranscodePool(TRANSCODE_WORKERS, TRANSCODE_QUEUE_MAX)
+# 识别结果按转码后音频的 sha256 缓存
+_ASR_CACHE = LRUCache(
+    maxsize=int(os.getenv("ASR_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("ASR_CACHE_TTL", "600")),
+)
+
+
+@app.middleware("http")
+async def _reject_oversized_audio(request: Request, call_next):
+    """声明的请求体已超过上限时，在解析 multipart 之前直接拒绝"""
+    if request.url.path == "/recognize/voice":
+        length = request.headers.get("content-length")
+        # 留出 multipart 边界和表单头的余量
+        if length and length.isdigit() and int(length) > MAX_AUDIO_BYTES + UPLOAD_CHUNK_SIZE:
+            return JSONResponse(status_code=413, content={"detail": f"音频文件不能超过 {MAX_AUDIO_BYTES} 字节"})
+    return await call_next(request)
+
+
+async def _iter_upload(file: UploadFile, first_chunk: bytes) -> AsyncIterator[bytes]:
+    """按块读取上传文件，累计超过 MAX_AUDIO_BYTES 时抛出 413"""
+    total = len(first_chunk)
+    chunk = first_chunk
+    while chunk:
+        if total > MAX_AUDIO_BYTES:
+            raise HTTPException(status_code=413, detail=f"音频文件不能超过 {MAX_AUDIO_BYTES} 字节")
+        yield chunk
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        total += len(chunk)
+
+
+async def convert_audio_to_pcm(chunks: AsyncIterator[bytes], source_format: str) -> tuple[bytes, int]:
     """
-    将音频转换为 WAV 格式（百度 ASR 支持的格式）
-    返回: (wav_bytes, sample_rate)
+    将分块读取的音频转换为 16kHz 单声道 PCM（百度 ASR 支持的格式）
+    返回: (pcm_bytes, sample_rate)
     """
-    temp_input = None
-    temp_output = None
-    
+    logger.info(f"正在转换音频格式: {source_format} -> pcm")
     try:
-        # 创建临时文件保存原始音频
-        with tempfile.NamedTemporaryFile(suffix=f'.{source_format}', delete=False) as tmp_input:
-            tmp_input.write(audio_bytes)
-            temp_input = tmp_input.name
-        
-        # 加载音频（pydub会自动检测格式）
-        logger.info(f"正在转换音频格式: {source_format} -> wav")
-        audio = AudioSegment.from_file(temp_input, format=source_format)
-        
-        # 设置参数：单声道，16kHz采样率，16位深度
-        audio = audio.set_channels(1)
-        audio = audio.set_frame_rate(16000)
-        audio = audio.set_sample_width(2)  # 16位 = 2字节
-        
-        # 导出为 WAV
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_output:
-            temp_output = tmp_output.name
-        
-        audio.export(temp_output, format='wav')
-        
-        # 读取转换后的 WAV 文件
-        with open(temp_output, 'rb') as f:
-            wav_bytes = f.read()
-        
-        logger.info(f"音频转换成功: 原始大小={len(audio_bytes)}, WAV大小={len(wav_bytes)}")
-        return wav_bytes, 16000
-        
-    except Exception as e:
+        async with _TRANSCODE_POOL.slot():
+            pcm_bytes = await transcode_stream(chunks, TRANSCODE_TIMEOUT)
+    except TranscodeBusy as e:
+        logger.warning(f"TRANSCODE_REJECTED {e}")
+        raise HTTPException(status_code=503, detail="语音识别繁忙，请稍后再试", headers={"Retry-After": "1"})
+    except TranscodeError as e:
         logger.error(f"音频转换失败: {e}")
         raise HTTPException(status_code=400, detail=f"音频格式转换失败: {str(e)}")
-    
-    finally:
-        # 清理临时文件
-        if temp_input and os.path.exists(temp_input):
-            try:
-                os.unlink(temp_input)
-            except Exception as e:
-                logger.warning(f"清理临时文件失败: {e}")
-        if temp_output and os.path.exists(temp_output):
-            try:
-                os.unlink(temp_output)
-            except Exception as e:
-                logger.warning(f"清理临时文件失败: {e}")
+
+    logger.info(f"音频转换成功: PCM大小={len(pcm_bytes)}")
+    return pcm_bytes, TARGET_RATE
 
 
 @app.post("/recognize/voice")
 async def recognize_voice(file: UploadFile = File(...)):
     """调用百度 ASR 进行语音识别，支持多种音频格式"""
+    if file.size is not None and file.size > MAX_AUDIO_BYTES:
+        raise HTTPException(status_code=413, detail=f"音频文件不能超过 {MAX_AUDIO_BYTES} 字节")
     try:
-        audio_bytes = await file.read()
+        first_chunk = await file.read(UPLOAD_CHUNK_SIZE)
     except Exception:
         raise HTTPException(status_code=400, detail="读取音频文件失败")
 
-    if not audio_bytes:
+    if not first_chunk:
         raise HTTPException(status_code=400, detail="文件内容为空")
 
     # 获取文件格式
     file_extension = file.filename.split('.')[-1].lower() if '.' in file.filename else 'webm'
     content_type = file.content_type or ''
     
-    logger.info(f"收到音频文件: filename={file.filename}, content_type={content_type}, size={len(audio_bytes)}")
+    logger.info(f"收到音频文件: filename={file.filename}, content_type={content_type}, size={file.size}")
     
     # 确定音频格式
     if 'webm' in content_type or file_extension == 'webm':
@@ -167,38 +245,43 @@ async def recognize_voice(file: UploadFile = File(...)):
         source_format = file_extension
     
     # 百度 ASR 支持的格式: pcm, wav, amr, m4a
-    # 如果是 webm, ogg, mp3 等格式，需要转换为 wav
+    # 如果是 webm, ogg, mp3 等格式，需要转换为 pcm
     need_conversion = source_format in ['webm', 'ogg', 'mp3', 'opus']
+    chunks = _iter_upload(file, first_chunk)
     
     if need_conversion:
-        logger.info(f"检测到 {source_format} 格式，需要转换为 WAV")
-        audio_bytes, sample_rate = convert_audio_to_wav(audio_bytes, source_format)
-        format_for_baidu = 'wav'
+        logger.info(f"检测到 {source_format} 格式，需要转换为 PCM")
+        audio_bytes, sample_rate = await convert_audio_to_pcm(chunks, source_format)
+        format_for_baidu = 'pcm'
     else:
+        audio_bytes = b"".join([chunk async for chunk in chunks])
         format_for_baidu = source_format
         sample_rate = 16000  # 默认采样率
 
+    # 相同音频（如移动网络不稳定时客户端重传）直接复用识别结果，不再调用百度 ASR
+    cache_key = f"{format_for_baidu}:{sample_rate}:{hashlib.sha256(audio_bytes).hexdigest()}"
+    text = _ASR_CACHE.get(cache_key)
+    if text is not None:
+        logger.info(f"ASR_CACHE_HIT size={len(audio_bytes)} text={text}")
+        return {"result": text, "category": classify_text(text)}
+
     token = await get_baidu_token()
 
-    speech_base64 = base64.b64encode(audio_bytes).decode()
-    payload = {
-        "format": format_for_baidu,
-        "rate": sample_rate,
+    # 使用 raw 方式上传：音频原样作为请求体，参数放在 URL 中，避免 base64 + JSON 的额外拷贝
+    params = {
         "dev_pid": 1537,  # 普通话
-        "speech": speech_base64,
-        "len": len(audio_bytes),
-        "channel": 1,
-        "token": token,
         "cuid": "nlp_service_demo",
+        "token": token,
     }
-
-    def _call_asr():
-        resp = requests.post(ASR_URL, json=payload, timeout=15)
-        resp.raise_for_status()
-        return resp.json()
+    headers = {"Content-Type": f"audio/{format_for_baidu};rate={sample_rate}"}
 
     try:
-        result = await asyncio.to_thread(_call_asr)
+        async with _ASR_SEMAPHORE:
+            resp = await _http_client().post(
+                ASR_URL, params=params, content=audio_bytes, headers=headers, timeout=ASR_TIMEOUT
+            )
+        resp.raise_for_status()
+        result = resp.json()
     except Exception as e:
         logger.error(f"百度ASR调用失败: {e}")
         raise HTTPException(status_code=502, detail=f"百度ASR接口调用失败: {e}")
@@ -210,15 +293,78 @@ async def recognize_voice(file: UploadFile = File(...)):
 
     text = "".join(result.get("result", []))
     logger.info(f"识别成功: {text}")
+    _ASR_CACHE.set(cache_key, text)
     
     category = classify_text(text)
     return {"result": text, "category": category}
 
+@app.get("/transcode/stats")
+async def transcode_stats():
+    """转码池执行、排队及拒绝统计"""
+    return _TRANSCODE_POOL.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """文本分类与语音识别结果缓存的命中统计"""
+    return {"text": _TEXT_CACHE.stats(), "asr": _ASR_CACHE.stats()}
+
 @app.post("/recognize/text")
 async def recognize_text(body: TextInput):
-    """Mock 文本分类接口"""
-    category = classify_text(body.text)
-    return {"input_text": body.text, "category": category}
+    """文本分类接口，返回匹配到的物品、类别及匹配得分"""
+    result = lookup_text(body.text)
+    return {"input_text": body.text, **result}
+
+
+TEXT_BATCH_MAX = int(os.getenv("TEXT_BATCH_MAX", "10000"))
+# 超过该数量时在线程中分类，避免大批量请求阻塞事件循环
+_TEXT_BATCH_THREAD_MIN = 500
+
+
+class TextBatchInput(BaseModel):
+    texts: list[str] = Field(..., description="待分类的文本列表")
+    compact: bool = Field(False, description="只返回与输入顺序一致的类别列表（吞吐优先，适合批量导入）")
+
+
+def _classify_batch(texts: list[str], compact: bool) -> dict:
+    # 同一批次中重复的文本只查一次
+    results: dict[str, dict] = {}
+    for text in texts:
+        if text not in results:
+            results[text] = lookup_text(text)
+    if compact:
+        return {"categories": [results[text]["category"] for text in texts]}
+    return {"results": [{"input_text": text, **results[text]} for text in texts]}
+
+
+@app.post("/recognize/text/batch")
+async def recognize_text_batch(body: TextBatchInput):
+    """批量文本分类，结果与输入顺序一致；compact=true 时只返回类别列表"""
+    if len(body.texts) > TEXT_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"单次最多分类 {TEXT_BATCH_MAX} 条文本")
+    if len(body.texts) >= _TEXT_BATCH_THREAD_MIN:
+        result = await asyncio.to_thread(_classify_batch, body.texts, body.compact)
+    else:
+        result = _classify_batch(body.texts, body.compact)
+    logger.info(f"TEXT_BATCH texts={len(body.texts)} compact={body.compact}")
+    return result
+
+
+@app.post("/admin/dictionary/reload")
+async def reload_dictionary(request: Request):
+    """重新加载垃圾词典（在后台线程构建完成后整体替换）；需设置 NLP_ADMIN_TOKEN 并携带 X-Admin-Token，未设置时不开放"""
+    global _DICTIONARY
+    if not NLP_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="未启用")
+    if request.headers.get("x-admin-token") != NLP_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="无权限")
+    try:
+        dictionary = await asyncio.to_thread(_load_dictionary)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=500, detail=f"词典加载失败: {e}")
+    _DICTIONARY = dictionary
+    _TEXT_CACHE.clear()
+    logger.info(f"DICTIONARY_RELOADED items={dictionary.item_count} entries={len(dictionary)}")
+    return {"items": dictionary.item_count, "entries": len(dictionary)}
 
 # ----------------------------------------------------------------------------
 #       大模型（百度千帆）问答接口
@@ -232,39 +378,16 @@ class QuestionRequest(BaseModel):
 async def ask_ai_direct_about_garbage(request: QuestionRequest):
     """调用百度千帆大模型进行垃圾分类问答"""
 
-    # 1. 获取凭证
-    ak = os.getenv("QIANFAN_AK")
-    sk = os.getenv("QIANFAN_SK")
-    if not ak or not sk:
+    # 1. 获取 access_token（缓存复用，到期前由后台任务刷新）
+    if not _QIANFAN_TOKEN.configured:
         return JSONResponse(status_code=500, content={"error": "AI助手暂时无法回答，请稍后再试"})
-
-    # 2. 获取 access_token
-    token_url = "https://aip.baidubce.com/oauth/2.0/token"
-    token_params = {
-        "grant_type": "client_credentials",
-        "client_id": ak,
-        "client_secret": sk,
-    }
-
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            token_resp = await client.post(token_url, params=token_params)
-    except Exception:
-        return JSONResponse(status_code=502, content={"error": "AI助手暂时无法回答，请稍后再试"})
-
-    if token_resp.status_code != 200:
-        return JSONResponse(status_code=502, content={"error": "AI助手暂时无法回答，请稍后再试"})
-
-    try:
-        token_data = token_resp.json()
-        access_token = token_data.get("access_token")
-    except Exception:
-        access_token = None
-
-    if not access_token:
+        access_token = await _QIANFAN_TOKEN.get()
+    except TokenError as e:
+        logger.error(f"千帆鉴权失败: {e}")
         return JSONResponse(status_code=502, content={"error": "AI助手暂时无法回答，请稍后再试"})
 
-    # 3. 调用聊天 API
+    # 2. 调用聊天 API
     chat_url = f"https://qianfan.baidubce.com/v2/chat/completions?access_token={access_token}"
     system_prompt = "你是一个专业的垃圾分类指导助手，请根据用户的问题，准确地回答垃圾如何分类。如果问题与垃圾分类无关，请礼貌地拒绝回答。"
 
@@ -279,8 +402,7 @@ async def ask_ai_direct_about_garbage(request: QuestionRequest):
     headers = {"Content-Type": "application/json"}
 
     try:
-        async with httpx.AsyncClient(timeout=20) as client:
-            chat_resp = await client.post(chat_url, headers=headers, json=payload)
+        chat_resp = await _http_client().post(chat_url, headers=headers, json=payload, timeout=CHAT_TIMEOUT)
     except Exception:
         return JSONResponse(status_code=502, content={"error": "AI助手暂时无法回答，请稍后再试"})
 
@@ -347,5 +469,7 @@ async def diagnose_service():
 
     return {
         "baidu_token": token_status,
+        "baidu_token_provider": _BAIDU_TOKEN.snapshot(),
+        "qianfan_token_provider": _QIANFAN_TOKEN.snapshot(),
         "ffmpeg": ffmpeg_status,
     }
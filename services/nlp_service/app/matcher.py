@@ -0,0 +1,70 @@
+"""多关键词匹配（Aho-Corasick 自动机）
+
+把所有类别的关键词编译为一个自动机，一次扫描文本即可找出全部命中的关键词，
+耗时只与文本长度有关，与关键词数量无关。
+
+命中多个关键词时取最长的一个；长度相同时按类别在规则中的顺序取靠前的类别。
+"""
+from collections import deque
+
+
+class KeywordMatcher:
+    def __init__(self, rules: dict[str, list[str]]):
+        # 每个节点: 子节点表、失配指针、以该节点结尾的最长关键词 (长度, 优先级, 关键词, 类别)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, int, str, str] | None] = [None]
+        self.categories = list(rules)
+        self.size = 0
+
+        for priority, (category, keywords) in enumerate(rules.items()):
+            for keyword in keywords:
+                keyword = keyword.strip().lower()
+                if keyword:
+                    self._add(keyword, priority, category)
+        self._build_fail_links()
+
+    def _add(self, keyword: str, priority: int, category: str) -> None:
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(None)
+            node = nxt
+        # 同一关键词出现在多个类别时保留靠前的类别
+        if self._out[node] is None:
+            self._out[node] = (len(keyword), priority, keyword, category)
+            self.size += 1
+
+    def _build_fail_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                # 自身不是关键词结尾时，沿失配指针继承最长的后缀关键词
+                if self._out[child] is None:
+                    self._out[child] = self._out[self._fail[child]]
+                queue.append(child)
+
+    def find(self, text: str) -> tuple[str, str] | None:
+        """返回文本中最佳命中的 (关键词, 类别)，没有命中时返回 None"""
+        goto, fail, out = self._goto, self._fail, self._out
+        best = None
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = out[node]
+            if hit is not None and (best is None or hit[0] > best[0] or (hit[0] == best[0] and hit[1] < best[1])):
+                best = hit
+        return None if best is None else (best[2], best[3])